@@ -0,0 +1,413 @@
+"""@package docstring
+File name : benchmark.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Benchmark of the acquisition cycles, the measure() of main.py used by auto() and
+	   test() is run on the emulated EZO circuits with a virtual clock so a run take less
+	   than a second. The time the Raspberry Pi stay awake, the I2C transactions and the
+	   file accesses are measured and compared with the baseline, the benchmark fail on
+	   a regression.
+	   Use : python3 bench/benchmark.py [--save] [--threshold 0.10]
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import builtins
+import tempfile
+import configparser
+
+#the root of the project, to import the classes of cls/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cls.emulator import EzoEmulator
+from cls.station import Station
+from cls.record import RecordWriter
+
+#main.py go in its own folder when imported
+CWD = os.getcwd()
+from main import measure
+os.chdir(CWD)
+
+
+#___BENCHMARK_CONFIG___
+
+#file where the reference results are saved
+BASELINE = os.path.join(ROOT, "bench", "baseline.json")
+
+#a result bigger than the baseline by more than this ratio is a regression
+THRESHOLD = 0.10
+
+#seed of the emulated circuits, every run see the same readings
+SEED = 1
+
+#the metrics compared with the baseline, a smaller value is always better
+METRICS = ["cycle_time", "transactions", "file_opens", "file_writes", "fsyncs", "bytes_per_row"]
+
+
+class VirtualClock(object):
+
+	def __init__(self):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the clock start at the real time
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		self.now = time.time()
+
+	def time(self):
+		"""
+		@Name : time()
+		@Brief : replace time.time()
+		@Input arg : n/a
+		@Return : the virtual time in seconds
+		"""
+
+		return self.now
+
+	def sleep(self, delay):
+		"""
+		@Name : sleep()
+		@Brief : replace time.sleep(), the virtual time go forward without waiting
+		@Input arg : (float) delay : the time to sleep in seconds
+		@Return : n/a
+		"""
+
+		self.now += max(0.0, delay)
+
+
+class Recorder(object):
+
+	def __init__(self, bus, clock):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, keep the time of every transaction on the bus
+		@Input arg : (EzoEmulator) bus : the emulated bus
+					 (VirtualClock) clock : the virtual clock
+		@Return : n/a
+		"""
+
+		self.bus = bus
+		self.clock = clock
+		#time of the first and last transaction of every address, {address : [first, last]}
+		self.span = {}
+
+	def write_i2c_block_data(self, address, cmd, data):
+		"""
+		@Name : write_i2c_block_data()
+		@Brief : same as smbus, the time of the transaction is saved
+		@Return : n/a
+		"""
+
+		self.mark(address)
+		return self.bus.write_i2c_block_data(address, cmd, data)
+
+	def read_i2c_block_data(self, address, cmd):
+		"""
+		@Name : read_i2c_block_data()
+		@Brief : same as smbus, the time of the transaction is saved
+		@Return : (list) the bytes read
+		"""
+
+		self.mark(address)
+		return self.bus.read_i2c_block_data(address, cmd)
+
+	def mark(self, address):
+		"""
+		@Name : mark()
+		@Brief : save the time of a transaction
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : n/a
+		"""
+
+		now = self.clock.time()
+		self.span.setdefault(address, [now, now])[1] = now
+
+
+class FileCounter(object):
+
+	def __init__(self):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, count the opens, writes and fsyncs of files, the file
+				 objects and the file descriptors of the os module (journal, binary log)
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		self.opens = 0
+		self.writes = 0
+		self.fsyncs = 0
+		self.real_open = builtins.open
+		self.real_fsync = os.fsync
+		self.real_os_open = os.open
+		self.real_os_write = os.write
+		#os.pwrite is missing on Windows
+		self.real_pwrite = getattr(os, "pwrite", None)
+
+	def patch(self):
+		"""
+		@Name : patch()
+		@Brief : replace the functions of the files by the counting ones
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		builtins.open = self.open
+		os.fsync = self.fsync
+		os.open = self.os_open
+		os.write = self.os_write
+		if self.real_pwrite is not None:
+			os.pwrite = self.pwrite
+
+	def restore(self):
+		"""
+		@Name : restore()
+		@Brief : put back the real functions of the files
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		builtins.open = self.real_open
+		os.fsync = self.real_fsync
+		os.open = self.real_os_open
+		os.write = self.real_os_write
+		if self.real_pwrite is not None:
+			os.pwrite = self.real_pwrite
+
+	def open(self, *args, **kwargs):
+		"""
+		@Name : open()
+		@Brief : replace open(), the writes of the file are counted
+		@Return : the opened file
+		"""
+
+		self.opens += 1
+		file = self.real_open(*args, **kwargs)
+		counter = self
+		real_write = file.write
+
+		def write(data):
+			counter.writes += 1
+			return real_write(data)
+
+		try:
+			file.write = write
+		except AttributeError:
+			pass
+
+		return file
+
+	def fsync(self, fd):
+		"""
+		@Name : fsync()
+		@Brief : replace os.fsync(), the call is counted
+		@Input arg : (int) fd : the file descriptor
+		@Return : n/a
+		"""
+
+		self.fsyncs += 1
+		return self.real_fsync(fd)
+
+	def os_open(self, *args, **kwargs):
+		"""
+		@Name : os_open()
+		@Brief : replace os.open(), the call is counted
+		@Return : the file descriptor
+		"""
+
+		self.opens += 1
+		return self.real_os_open(*args, **kwargs)
+
+	def os_write(self, fd, data):
+		"""
+		@Name : os_write()
+		@Brief : replace os.write(), the call is counted
+		@Input arg : (int) fd : the file descriptor
+					 (bytes) data : the data written
+		@Return : the number of bytes written
+		"""
+
+		self.writes += 1
+		return self.real_os_write(fd, data)
+
+	def pwrite(self, fd, data, offset):
+		"""
+		@Name : pwrite()
+		@Brief : replace os.pwrite(), the call is counted
+		@Input arg : (int) fd : the file descriptor
+					 (bytes) data : the data written
+					 (int) offset : the position of the data in the file
+		@Return : the number of bytes written
+		"""
+
+		self.writes += 1
+		return self.real_pwrite(fd, data, offset)
+
+
+def configure(folder):
+	"""
+	@Name : configure()
+	@Brief : load config.ini with all the files moved in a temporary folder
+	@Input arg : (string) folder : the temporary folder
+	@Return : the config
+	"""
+
+	config_file = configparser.ConfigParser()
+	config_file.read(os.path.join(ROOT, "cfg", "config.ini"))
+
+	config_file.set("PATH", "usb", os.path.join(folder, "usb", "data.csv"))
+	config_file.set("PATH", "local", os.path.join(folder, "data.csv"))
+	config_file.set("PATH", "error", os.path.join(folder, "errorlog.txt"))
+
+	return config_file
+
+
+def scenario(name, cycles):
+	"""
+	@Name : scenario()
+	@Brief : run the measure() of main.py on the emulated circuits, like auto() (1 cycle)
+			 or test() (20 cycles), and measure them
+	@Input arg : (string) name : the name of the scenario
+				 (int) cycles : the number of cycles
+	@Return : (dict) the results
+	"""
+
+	folder = tempfile.mkdtemp(prefix="bench_")
+	clock = VirtualClock()
+	counter = FileCounter()
+
+	real_time = time.time
+	real_sleep = time.sleep
+
+	try:
+		config_file = configure(folder)
+
+		time.time = clock.time
+		time.sleep = clock.sleep
+		counter.patch()
+
+		emulator = EzoEmulator(config_file, clock.time, SEED)
+		bus = Recorder(emulator, clock)
+		station = Station(None, config_file, bus)
+
+		start = clock.time()
+
+		#the rows are built in memory and saved in one write, like auto() and test()
+		record = RecordWriter(station.machine, config_file)
+
+		#time every probe was in use, added for all the cycles
+		probes = dict((str(adr), 0.0) for adr in station.probes())
+
+		for x in range(cycles):
+			measure(station, record)
+
+			for adr in station.probes():
+				first, last = bus.span.pop(adr, [0.0, 0.0])
+				probes[str(adr)] += (last - first) / cycles
+
+		record.close()
+
+		cycle_time = (clock.time() - start) / cycles
+
+		#the error log is written by a thread, we wait for it to be done
+		station.machine.errors.close()
+
+	finally:
+		time.time = real_time
+		time.sleep = real_sleep
+		counter.restore()
+
+	size = os.path.getsize(config_file.get("PATH", "local"))
+	shutil.rmtree(folder, ignore_errors=True)
+
+	for adr in probes:
+		probes[adr] = round(probes[adr], 3)
+
+	return {"cycle_time" : round(cycle_time, 3),
+			"probe_time" : probes,
+			"transactions" : round(emulator.transactions / float(cycles), 1),
+			"file_opens" : round(counter.opens / float(cycles), 1),
+			"file_writes" : round(counter.writes / float(cycles), 1),
+			"fsyncs" : round(counter.fsyncs / float(cycles), 1),
+			"bytes_per_row" : round(size / float(cycles), 1)}
+
+
+def compare(results, baseline, threshold):
+	"""
+	@Name : compare()
+	@Brief : find the metrics worst than the baseline by more than the threshold
+	@Input arg : (dict) results : the results of all the scenarios
+				 (dict) baseline : the saved results
+				 (float) threshold : the accepted ratio
+	@Return : (list) the regressions as text
+	"""
+
+	regressions = []
+
+	for name in results:
+		if name not in baseline:
+			continue
+
+		for metric in METRICS:
+			new = results[name][metric]
+			old = baseline[name].get(metric)
+
+			if old is not None and new > old * (1.0 + threshold) + 1e-9:
+				regressions.append(name + " " + metric + " : " + str(old) + " -> " + str(new))
+
+	return regressions
+
+
+def main(argv):
+	"""
+	@Name : main()
+	@Brief : run all the scenarios, print the results and compare them with the baseline
+	@Input arg : (list) argv : the arguments of the command line
+	@Return : 0 if there is no regression, else 1
+	"""
+
+	threshold = THRESHOLD
+	if "--threshold" in argv:
+		threshold = float(argv[argv.index("--threshold") + 1])
+
+	results = {"auto" : scenario("auto", 1),
+			   "test" : scenario("test", 20)}
+
+	for name in sorted(results):
+		print(name)
+		for metric in METRICS + ["probe_time"]:
+			print("    " + metric + " : " + str(results[name][metric]))
+
+	if "--save" in argv:
+		with open(BASELINE, "w") as file:
+			json.dump(results, file, indent=1, sort_keys=True)
+		print("Baseline saved")
+		return 0
+
+	if not os.path.exists(BASELINE):
+		print("No baseline, use --save to make one")
+		return 0
+
+	with open(BASELINE, "r") as file:
+		baseline = json.load(file)
+
+	regressions = compare(results, baseline, threshold)
+
+	for line in regressions:
+		print("REGRESSION " + line)
+
+	return 1 if len(regressions) != 0 else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,521 @@
+"""@package docstring
+File name : acquisition.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Acquisition engine used by main.py, wake all the EZO circuits together and
+	   interleave their warm-up readings and processing delays on the shared I2C bus,
+	   a full cycle take about the time of the slowest probe instead of the sum of all.
+	   The probes, their delays and the compensation they wait for come from the
+	   sensor registry (see sensors.py).
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import time
+import heapq
+import statistics
+from cls.control import EZO_SUCCESS, EZO_PENDING, POLL_FIRST, POLL_MAX
+from cls.metrics import Metrics
+from cls.health import HEALTH_FAIL
+from cls.compensation import CompensationManager
+from cls.sensors import Registry
+
+
+class Acquisition(object):
+
+	def __init__(self, machine, config_file, metrics=None):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor
+		@Input arg : (Control) machine : object used to talk to the EZO circuits
+					 (ConfigParser) config_file : the loaded config.ini
+					 (Metrics) metrics : timing of the stages, disabled if not given
+		@Return : n/a
+		"""
+
+		self.machine = machine
+		self.config_file = config_file
+		self.metrics = metrics if metrics is not None else Metrics()
+		#the probes of the bus and the dependency graph of the compensations
+		self.sensors = Registry(config_file)
+		for error in self.sensors.errors:
+			self.machine.log(error)
+		#last compensation sent to every circuit, only the changes are sent
+		self.compensation = CompensationManager(config_file)
+		#statistics of the readings of the last cycle in the "stats" sampling mode,
+		#{address : (mean, standard deviation, count)}
+		self.stats = {}
+
+	def cycle(self, address):
+		"""
+		@Name : cycle()
+		@Brief : take one reading on every EZO circuit in "address", all the probes are
+				 worked on at the same time, a probe waiting for a delay let the others use the bus
+		@Input arg : (list) address : the address of the EZO circuits
+		@Return : (dict) the reading of every address
+		"""
+
+		results = {}
+		self.stats = {}
+
+		#the dead probes are skipped (see health.py)
+		health = self.machine.health
+		previous = health.snapshot()
+		active = [adr for adr in address if health.allow(adr)]
+
+		#scheduler queue, (time when the task is ready, order, address, task, value sent to the task)
+		queue = []
+		#tasks waiting for the reading of a other probe, {address waited : [(address, task)]}
+		waiting = {}
+		order = 0
+
+		#the probes giving a compensation start first, so the ones waiting for them are not late
+		for adr in self.sensors.order(active):
+			heapq.heappush(queue, (time.time(), order, adr, self.probe(adr, results), None))
+			order += 1
+
+		while len(queue) != 0 or len(waiting) != 0:
+
+			if len(queue) == 0:
+				#a probe is waiting for a reading that will never come
+				for other in list(waiting):
+					for (adr, task) in waiting.pop(other):
+						heapq.heappush(queue, (time.time(), order, adr, task, ""))
+						order += 1
+
+			due, x, adr, task, value = heapq.heappop(queue)
+
+			#we wait for the first task to be ready, the bus is free in the meantime
+			now = time.time()
+			if due > now:
+				time.sleep(due - now)
+
+			step = self.resume(task, value)
+
+			if isinstance(step, tuple) and step[0] == "WAIT":
+				#the task need the reading of a other probe
+				waiting.setdefault(step[1], []).append((adr, task))
+			elif step is not None:
+				heapq.heappush(queue, (time.time() + step, order, adr, task, None))
+				order += 1
+
+			#the tasks waiting for a reading now available are put back in the queue
+			for other in list(waiting):
+				if other in results or other not in active:
+					for (blocked, task) in waiting.pop(other):
+						heapq.heappush(queue, (time.time(), order, blocked, task, results.get(other, "")))
+						order += 1
+
+		for adr in active:
+			success = self.value(results.get(adr, "")) is not None
+			health.finish(adr, success)
+			if not success:
+				self.compensation.forget(adr)
+
+		#a skipped circuit may be rebooted before it is used again
+		for adr in address:
+			if adr not in active:
+				self.compensation.forget(adr)
+
+		health.save(previous)
+
+		return results
+
+	def resume(self, task, value):
+		"""
+		@Name : resume()
+		@Brief : run a task until its next delay
+		@Input arg : (generator) task : the task of a probe
+					 value : the value sent back to the task
+		@Return : the next step of the task, None when the task is done
+		"""
+
+		try:
+			return task.send(value)
+		except StopIteration:
+			return None
+
+	def probe(self, adr, results):
+		"""
+		@Name : probe()
+		@Brief : the task of one probe, wake up, warm-up, compensation, reading and sleep,
+				 each delay is given back to the scheduler instead of blocking the bus
+		@Input arg : (int) adr : the address of the EZO circuit
+					 (dict) results : where the reading of the probe is saved
+		@Return : a generator of the delays of the probe
+		"""
+
+		sensor = self.sensors.get(adr)
+
+		#waking up the EZO from sleep, the wake up is not a real command so the answer is not checked
+		mark = self.metrics.start()
+		self.machine.send(adr, "WAKEUP")
+		yield from self.complete(adr, None, sensor.sleep)
+		self.machine.health.broken.discard(adr)
+		self.metrics.stop("wake", adr, mark)
+
+		#we take dummy readings after the wake up until the reading are stable
+		mark = self.metrics.start()
+		samples = yield from self.warmup(adr)
+		self.metrics.stop("warmup", adr, mark)
+
+		#the circuit don't answer anymore, the other probes don't wait for it
+		if adr in self.machine.health.broken:
+			return
+
+		"""
+		Temprature and salinity compensation,
+		we wait for the readings of this cycle the sensor need (ex: TEMP and CON for the DO),
+		the command is only sent when the value changed since the last one applied
+		"""
+		mark = self.metrics.start()
+
+		for kind, name in sensor.inputs:
+			reading = yield ("WAIT", self.sensors.names[name].address)
+			yield from self.compensate(adr, kind, reading, sensor.compensation)
+
+		self.metrics.stop("compensation", adr, mark)
+
+		"""
+		we send the char "R" to read once the
+		sensor to take a reading
+		"""
+		mark = self.metrics.start()
+		yield from self.command(adr, "r", sensor.read)
+
+		#we read back the answer from the EZO circuit
+		results[adr] = self.machine.read(adr)
+		self.metrics.stop("read", adr, mark)
+
+		#the readings of the warm-up are used instead of a single one, no extra bus read
+		if self.sensors.stats:
+			results[adr] = self.summary(adr, samples, results[adr])
+
+		#the EZO circuit is put back to sleep, a sleeping circuit don't answer so we don't wait
+		mark = self.metrics.start()
+		self.machine.send(adr, "SLEEP")
+		self.metrics.stop("sleep", adr, mark)
+
+	def stream(self, address, period, stop, compensate=60):
+		"""
+		@Name : stream()
+		@Brief : keep the EZO circuits awake and read them all at every period, the "R" command
+				 is sent to all the circuits at once so they compute their reading together.
+				 The EZO circuits have no continuous reading in I2C mode, this is the closest.
+				 The readings of the warm-up are taken at the same period and dropped, the
+				 samples start when every probe is stable (see settle()).
+		@Input arg : (list) address : the address of the EZO circuits
+					 (float) period : time between two readings (in seconds)
+					 (Event) stop : the stream end when this event is set
+					 (int) compensate : number of readings between two compensations
+		@Return : a generator of {address : (time of the bus read, reading)} for every period
+		"""
+
+		sensors = [self.sensors.get(adr) for adr in address]
+
+		#waking up all the EZO together
+		for adr in address:
+			self.machine.send(adr, "WAKEUP")
+		time.sleep(max([sensor.sleep for sensor in sensors] + [0.0]))
+
+		#the warm-up of every probe, {address : [last reading, number of readings, stable]}
+		warm = dict((sensor.address, [None, 0, False]) for sensor in sensors)
+		#the compensations not sent yet, (address, kind, name of the input probe, tick asked)
+		waiting = []
+
+		start = time.time()
+		tick = 0
+
+		try:
+			while not stop.is_set():
+				#all the circuits compute their reading at the same time
+				for adr in address:
+					self.machine.send(adr, "r")
+
+				sample = {}
+				for sensor in sensors:
+					adr = sensor.address
+					code = self.machine.wait(adr, sensor.read, "r")
+					reading = self.machine.read(adr) if code == EZO_SUCCESS else ""
+					sample[adr] = (time.time(), reading)
+					if reading == "":
+						self.machine.health.flag(adr, HEALTH_FAIL)
+						self.compensation.forget(adr)
+					self.settle(sensor, reading, warm[adr])
+
+				#the readings of the warm-up are not given (not in the data nor the summary)
+				stable = all(state[2] for state in warm.values())
+				if stable:
+					yield sample
+
+				#the compensation is checked from time to time with the last readings, at
+				#every reading during the warm-up
+				if tick % compensate == 0 or not stable:
+					for sensor in sensors:
+						for kind, name in sensor.inputs:
+							if not any(item[:3] == (sensor.address, kind, name) for item in waiting):
+								waiting.append((sensor.address, kind, name, tick))
+
+				if len(waiting) != 0:
+					waiting = self.apply(waiting, sample, start + (tick + 1) * period, tick - compensate)
+
+				"""
+				The next reading start at a multiple of the period, a reading a bit
+				late start right away, when late by a whole period the missed ones
+				are skipped
+				"""
+				tick += 1
+				if time.time() - (start + tick * period) > period:
+					tick = int((time.time() - start) / period) + 1
+
+				stop.wait(max(0.0, start + tick * period - time.time()))
+		finally:
+			#the EZO circuits are put back to sleep
+			for adr in address:
+				self.machine.send(adr, "SLEEP")
+
+	def settle(self, sensor, reading, state):
+		"""
+		@Name : settle()
+		@Brief : the warm-up of the stream mode, same rule as warmup() with the readings of
+				 the stream, the number of readings needed is saved in metrics.csv
+		@Input arg : (Sensor) sensor : the probe
+					 (string) reading : the answer of the circuit, empty if not read
+					 (list) state : [last reading, number of readings, stable], changed here
+		@Return : n/a
+		"""
+
+		if state[2]:
+			return
+
+		minimum, maximum, tolerance = sensor.warmup
+		last = state[0]
+		reading = self.value(reading)
+		state[0] = reading
+		state[1] += 1
+
+		if state[1] >= maximum or sensor.address in self.machine.health.broken:
+			state[2] = True
+		elif state[1] >= minimum and reading is not None and last is not None and abs(reading - last) <= tolerance:
+			state[2] = True
+
+		if state[2]:
+			self.metrics.count("warmup_reads", sensor.address, state[1])
+
+	def warmup(self, adr):
+		"""
+		@Name : warmup()
+		@Brief : take readings after the wake up until two successive readings are within the
+				 tolerance of the probe type, always between the minimum and maximum of config.ini,
+				 the number of readings needed is saved in metrics.csv
+		@Input arg : (int) adr : the address of the EZO circuit
+		@Return : a generator of the delays of the warm-up, the stable readings at the end
+				  (the last ones within the tolerance of each other)
+		"""
+
+		sensor = self.sensors.get(adr)
+		minimum, maximum, tolerance = sensor.warmup
+
+		last = None
+		count = 0
+		samples = []
+
+		while count < maximum:
+			code = yield from self.command(adr, "r", sensor.read)
+			count += 1
+
+			if adr in self.machine.health.broken:
+				break
+
+			reading = None
+			if code == EZO_SUCCESS:
+				reading = self.value(self.machine.read(adr))
+
+			#the readings before a jump are not stable, they are dropped
+			if reading is None or last is None or abs(reading - last) > tolerance:
+				samples = []
+			if reading is not None:
+				samples.append(reading)
+
+			#the reading converged
+			if count >= minimum and reading is not None and last is not None and abs(reading - last) <= tolerance:
+				break
+
+			last = reading
+
+		#the number of readings needed, in metrics.csv (not a error)
+		self.metrics.count("warmup_reads", adr, count)
+
+		return samples
+
+	def summary(self, adr, samples, reading):
+		"""
+		@Name : summary()
+		@Brief : the statistics of the stable readings of the warm-up and of the reading, saved
+				 in "stats" for the data row, the median is less changed by a noisy reading
+		@Input arg : (int) adr : the address of the EZO circuit
+					 (list) samples : the stable readings of the warm-up
+					 (string) reading : the answer of the circuit to the "R" command
+		@Return : (string) the median, with the decimals of the reading, the reading if it's
+				  not a number
+		"""
+
+		value = self.value(reading)
+
+		if value is None:
+			return reading
+
+		samples = samples + [value]
+		field = reading.split(",")[0]
+		digits = len(field.partition(".")[2])
+
+		self.stats[adr] = ("%.*f" % (digits, statistics.mean(samples)),
+						   "%.*f" % (digits + 1, statistics.pstdev(samples)),
+						   str(len(samples)))
+
+		return "%.*f" % (digits, statistics.median(samples))
+
+	def compensate(self, adr, kind, reading, delay):
+		"""
+		@Name : compensate()
+		@Brief : send the compensation to a EZO circuit if it changed (see compensation.py)
+		@Input arg : (int) adr : the address of the EZO circuit
+					 (string) kind : "T" (temperature) or "S" (salinity)
+					 (string) reading : the reading of the input probe in this cycle
+					 (float) delay : the longest time the circuit can take to compute the command
+		@Return : a generator of the polling delays
+		"""
+
+		string = self.compensation.command(adr, kind, reading)
+
+		if string is None:
+			return
+
+		code = yield from self.command(adr, string, delay)
+
+		if code == EZO_SUCCESS:
+			self.compensation.done(adr, kind, reading)
+
+	def apply(self, waiting, sample, deadline, late):
+		"""
+		@Name : apply()
+		@Brief : same as compensate() for the stream mode, the commands are sent to all the
+				 circuits at once and computed in the time left before the next reading, so
+				 the period is kept. A circuit get one command per reading, a command not
+				 done before the next reading wait for the next period (sent anyway when it
+				 waited too long, the period is then too short for the compensation).
+		@Input arg : (list) waiting : the compensations not sent, (address, kind, name of the
+							 input probe, tick asked)
+					 (dict) sample : the last readings, {address : (time of the bus read, reading)}
+					 (float) deadline : the time of the next reading
+					 (int) late : the commands asked before this tick are sent anyway
+		@Return : (list) the compensations still not sent
+		"""
+
+		sent = []
+		left = []
+
+		for item in waiting:
+			adr, kind, name, asked = item
+			sensor = self.sensors.get(adr)
+
+			if adr in [other[0] for other in sent]:
+				left.append(item)
+				continue
+
+			reading = sample.get(self.sensors.names[name].address, (0, ""))[1]
+			string = self.compensation.command(adr, kind, reading)
+
+			if string is None:
+				continue
+
+			if time.time() + sensor.compensation > deadline and asked > late:
+				left.append(item)
+				continue
+
+			if self.machine.send(adr, string):
+				sent.append((adr, kind, reading, string, sensor.compensation))
+
+		#all the circuits compute their command at the same time
+		for adr, kind, reading, string, delay in sent:
+			if self.machine.wait(adr, delay, string) == EZO_SUCCESS:
+				self.compensation.done(adr, kind, reading)
+
+		return left
+
+	def command(self, adr, string, delay):
+		"""
+		@Name : command()
+		@Brief : send a command to a EZO circuit and give back the polling delays to the scheduler
+		@Input arg : (int) adr : the address of the EZO circuit
+					 (string) string : the command
+					 (float) delay : the longest time the circuit can take to compute the command
+		@Return : a generator of the polling delays, the response code at the end
+		"""
+
+		if not self.machine.send(adr, string):
+			return None
+
+		return (yield from self.complete(adr, string, delay))
+
+	def complete(self, adr, string, delay):
+		"""
+		@Name : complete()
+		@Brief : poll a EZO circuit with a growing delay until the last command is done
+		@Input arg : (int) adr : the address of the EZO circuit
+					 (string) string : the command, None if a syntax error is expected
+					 (float) delay : the longest time the circuit can take to compute the command
+		@Return : a generator of the polling delays, the response code at the end
+		"""
+
+		waited = 0
+		backoff = POLL_FIRST
+
+		while True:
+			step = max(0, min(backoff, delay - waited))
+			yield step
+			waited += step
+
+			code = self.machine.poll(adr, string)
+
+			if code != EZO_PENDING:
+				return code
+
+			if waited >= delay:
+				self.machine.log("EZO timeout", adr, string)
+				return code
+
+			backoff = min(backoff * 2, POLL_MAX)
+
+	def value(self, reading):
+		"""
+		@Name : value()
+		@Brief : convert the answer of a EZO circuit to a number, only the first field is
+				 used when the circuit give more than one (ex : "152.3,14.16")
+		@Input arg : (string) reading : the answer of the circuit
+		@Return : the reading as a float, None if it's not a number
+		"""
+
+		field = reading.split(",")[0]
+
+		if not self.is_float(field):
+			return None
+
+		return float(field)
+
+	def is_float(self, n):
+		"""
+		@Name : is_float()
+		@Brief : return "true" if the string "n" is a decimal number, else return "false"
+		@Input arg : n : the string that need verification
+		@Return : true or false
+		"""
+
+		try:
+			float(n)
+		except (TypeError, ValueError):
+			return False
+
+		return True
@@ -0,0 +1,272 @@
+"""@package docstring
+File name : aggregate.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Hourly and daily summary of the readings (count, min, max, mean of every probe),
+	   updated with every row saved so the data file is never read again. The hour and
+	   the day not finished are kept in summary.json next to data.csv, a finished one is
+	   added at the end of summary.csv. The "status" command of main.py print the last
+	   ones without reading the data.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import json
+import time
+
+
+#___SUMMARY_FORMAT___
+
+#the periods summarized, in the order of summary.csv
+PERIODS = ["HOUR", "DAY"]
+
+#first line of summary.csv, one line per period and probe
+HEADER = "PERIOD; START; PROBE; COUNT; MIN; MAX; MEAN; \n"
+
+#size of the end of summary.csv read by the status command (in bytes)
+TAIL = 8192
+
+
+class AggregateStore(object):
+
+	def __init__(self, folder):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the periods not finished are read back when needed
+		@Input arg : (string) folder : the folder of the data file
+		@Return : n/a
+		"""
+
+		self.path = os.path.join(folder, "summary.csv")
+		self.state = os.path.join(folder, "summary.json")
+
+		#the periods not finished, {period : [start, {probe : [count, min, max, sum]}]},
+		#None until summary.json is read
+		self.open = None
+		#the periods finished and not saved yet, (period, start, probe, line)
+		self.lines = []
+		#start of the last period of every probe in summary.csv, {(period, probe) : start},
+		#None until it is read
+		self.written = None
+
+	def load(self):
+		"""
+		@Name : load()
+		@Brief : read the periods not finished from summary.json, once
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.open is not None:
+			return
+
+		self.open = {}
+
+		if not os.path.exists(self.state):
+			return
+
+		try:
+			with open(self.state, "r") as stateFile:
+				self.open = dict((period, value) for period, value in json.load(stateFile).items() if period in PERIODS)
+		except (IOError, OSError, ValueError, TypeError, AttributeError):
+			self.open = {}
+
+	def add(self, epoch, values):
+		"""
+		@Name : add()
+		@Brief : add the readings of a row to the periods, a row older than the period
+				 (clock set back) is not counted
+		@Input arg : (float) epoch : the time of the row in seconds since 1970
+					 (dict) values : the readings of the row, {probe : float}, NaN if missing
+		@Return : n/a
+		"""
+
+		self.load()
+
+		for period in PERIODS:
+			start = begin(period, epoch)
+			current = self.open.get(period)
+
+			if current is not None and start < current[0]:
+				continue
+
+			if current is None or start > current[0]:
+				if current is not None:
+					self.close(period, current)
+				current = [start, {}]
+				self.open[period] = current
+
+			for probe, value in values.items():
+				if value != value:
+					continue
+
+				stats = current[1].get(probe)
+
+				if stats is None:
+					current[1][probe] = [1, value, value, value]
+				else:
+					stats[0] += 1
+					stats[1] = min(stats[1], value)
+					stats[2] = max(stats[2], value)
+					stats[3] += value
+
+	def close(self, period, current):
+		"""
+		@Name : close()
+		@Brief : make the lines of summary.csv of a finished period
+		@Input arg : (string) period : HOUR or DAY
+					 (list) current : [start, {probe : [count, min, max, sum]}]
+		@Return : n/a
+		"""
+
+		for probe in sorted(current[1]):
+			self.lines.append((period, current[0], probe, line(period, current[0], probe, current[1][probe])))
+
+	def save(self):
+		"""
+		@Name : save()
+		@Brief : add the finished periods at the end of summary.csv and save the ones not
+				 finished in summary.json. A crash between the two files give back the old
+				 summary.json, the period finished again is not added twice because the
+				 periods already in summary.csv are skipped.
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.open is None:
+			return
+
+		if len(self.lines) != 0:
+			cut = False
+			if self.written is None:
+				self.written = {}
+				fields, cut = self.tail()
+				for field in fields:
+					key = (field[0], field[2])
+					self.written[key] = max(self.written.get(key, -1), stamp(field[1]))
+
+			lines = [text for period, start, probe, text in self.lines if start > self.written.get((period, probe), -1)]
+
+			if len(lines) != 0:
+				new = not os.path.exists(self.path)
+				with open(self.path, "a") as summaryFile:
+					#the last line was cut by a power loss, the new ones start on a new line
+					summaryFile.write((HEADER if new else "") + ("\n" if cut else "") + "".join(lines))
+
+			for period, start, probe, text in self.lines:
+				self.written[(period, probe)] = max(self.written.get((period, probe), -1), start)
+			self.lines = []
+
+		temp = self.state + ".tmp"
+
+		with open(temp, "w") as stateFile:
+			stateFile.write(json.dumps(self.open))
+		os.replace(temp, self.state)
+
+	def status(self):
+		"""
+		@Name : status()
+		@Brief : the last finished hour and day and the ones not finished, read from the end
+				 of summary.csv and from summary.json only
+		@Input arg : n/a
+		@Return : (list) the lines, in the summary.csv format
+		"""
+
+		last = {}
+
+		#the periods are added in the order of time so the lines of the last start of
+		#every period are kept
+		for fields in self.tail()[0]:
+			if fields[0] not in last or last[fields[0]][0] != fields[1]:
+				last[fields[0]] = (fields[1], [])
+			last[fields[0]][1].append(";".join(fields))
+
+		self.load()
+
+		result = []
+
+		for period in PERIODS:
+			if period in last:
+				result += last[period][1]
+			if period in self.open:
+				result += [line(period, self.open[period][0], probe, self.open[period][1][probe]) for probe in sorted(self.open[period][1])]
+
+		return result
+
+	def tail(self):
+		"""
+		@Name : tail()
+		@Brief : read the lines at the end of summary.csv, the first line read can be cut and
+				 is dropped, like a last line cut by a power loss (without its new line)
+		@Input arg : n/a
+		@Return : (list, bool) the fields of the lines (the last one ending with the new line)
+				  and True if the file don't end with a new line
+		"""
+
+		if not os.path.exists(self.path):
+			return [], False
+
+		with open(self.path, "rb") as summaryFile:
+			size = os.fstat(summaryFile.fileno()).st_size
+			summaryFile.seek(max(0, size - TAIL))
+			lines = summaryFile.read().decode("ascii", "replace").split("\n")
+
+		result = []
+
+		for text in lines[1 if size > TAIL else 0:-1]:
+			fields = text.split(";")
+			if len(fields) < 7 or fields[0] not in PERIODS or stamp(fields[1]) is None:
+				continue
+			fields[-1] += "\n"
+			result.append(fields)
+
+		return result, size != 0 and lines[-1] != ""
+
+
+def stamp(text):
+	"""
+	@Name : stamp()
+	@Brief : read the start of a period of summary.csv
+	@Input arg : (string) text : the start ("DD/MM/YYYY-HH:MM")
+	@Return : (int) the start in seconds since 1970, None if not valid
+	"""
+
+	try:
+		return int(time.mktime(time.strptime(text, "%d/%m/%Y-%H:%M")))
+	except ValueError:
+		return None
+
+
+def begin(period, epoch):
+	"""
+	@Name : begin()
+	@Brief : the start of the period of a time, in local time like the rows of data.csv
+	@Input arg : (string) period : HOUR or DAY
+				 (float) epoch : the time in seconds since 1970
+	@Return : (int) the start in seconds since 1970
+	"""
+
+	date = time.localtime(epoch)
+
+	if period == "HOUR":
+		return int(time.mktime((date.tm_year, date.tm_mon, date.tm_mday, date.tm_hour, 0, 0, 0, 0, -1)))
+
+	return int(time.mktime((date.tm_year, date.tm_mon, date.tm_mday, 0, 0, 0, 0, 0, -1)))
+
+
+def line(period, start, probe, stats):
+	"""
+	@Name : line()
+	@Brief : the line of summary.csv of a probe
+	@Input arg : (string) period : HOUR or DAY
+				 (int) start : the start of the period in seconds since 1970
+				 (string) probe : the name of the probe
+				 (list) stats : [count, min, max, sum]
+	@Return : (string) the line ("PERIOD;DD/MM/YYYY-HH:MM;PROBE;count;min;max;mean;")
+	"""
+
+	return "%s;%s;%s;%d;%g;%g;%g;\n" % (period, time.strftime("%d/%m/%Y-%H:%M", time.localtime(start)), probe,
+									  stats[0], stats[1], stats[2], stats[3] / stats[0])
@@ -0,0 +1,101 @@
+"""@package docstring
+File name : compensation.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Temperature and salinity compensation of the EZO circuits, the last value sent to
+	   every circuit is kept and the "T," and "S," commands are only sent again when the
+	   reading moved more than the deadband of config.ini. The EZO circuits are powered by
+	   the Raspberry Pi, so they start with their default compensation at every boot of
+	   the program, a circuit that failed a transfer or was skipped may have been
+	   rebooted and get its compensation again.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+
+#___DEFAULT_CONFIG___
+
+#default values when missing from the [COMPENSATION] section of config.ini
+DEADBAND_T = 0.1		#change of the temperature sent again (in degrees C)
+DEADBAND_S = 100.0		#change of the salinity sent again (in uS/cm, the reading of the CON probe)
+
+
+class CompensationManager(object):
+
+	def __init__(self, config_file):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, no compensation is known at the start
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+		@Return : n/a
+		"""
+
+		self.deadband = {"T" : config_file.getfloat("COMPENSATION", "temperature", fallback=DEADBAND_T),
+						 "S" : config_file.getfloat("COMPENSATION", "salinity", fallback=DEADBAND_S)}
+
+		#last value applied on every circuit, {(address, "T" or "S") : value}
+		self.applied = {}
+
+	def command(self, address, kind, reading):
+		"""
+		@Name : command()
+		@Brief : give the compensation command to send to a circuit, if needed
+		@Input arg : (int) address : the address of the EZO circuit
+					 (string) kind : "T" (temperature) or "S" (salinity)
+					 (string) reading : the reading of the input probe in this cycle (see sensors.py)
+		@Return : (string) the command (ex: "T,21.034"), None if the reading is not a
+				  number or is within the deadband of the value applied, only the first
+				  value of a reading with more than one is sent (ex: "S,152.3")
+		"""
+
+		value = self.value(reading)
+
+		if value is None:
+			return None
+
+		last = self.applied.get((address, kind))
+
+		if last is not None and abs(value - last) <= self.deadband.get(kind, 0.0):
+			return None
+
+		return kind + "," + reading.split(",")[0].strip()
+
+	def done(self, address, kind, reading):
+		"""
+		@Name : done()
+		@Brief : save the value applied on a circuit, once the command is computed
+		@Input arg : (int) address : the address of the EZO circuit
+					 (string) kind : "T" (temperature) or "S" (salinity)
+					 (string) reading : the reading sent
+		@Return : n/a
+		"""
+
+		self.applied[(address, kind)] = self.value(reading)
+
+	def forget(self, address):
+		"""
+		@Name : forget()
+		@Brief : drop the values applied on a circuit, they are sent again the next time
+				 (the circuit failed and may have been rebooted)
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : n/a
+		"""
+
+		self.applied.pop((address, "T"), None)
+		self.applied.pop((address, "S"), None)
+
+	def value(self, reading):
+		"""
+		@Name : value()
+		@Brief : convert a reading to a number, only the first field is used when the
+				 circuit give more than one (ex : "152.3,14.16"), like acquisition.py
+		@Input arg : (string) reading : the reading
+		@Return : the reading as a float, None if it's not a number
+		"""
+
+		try:
+			return float(reading.split(",")[0])
+		except (AttributeError, TypeError, ValueError):
+			return None
@@ -1,7 +1,16 @@
+import io
 import os
 import time
+import errno
 import subprocess
-import io
+from cls.mount import MountCache
+from cls.errorlog import ErrorLogger
+from cls.binlog import BinaryLog
+from cls.sync import UsbSync
+from cls import journal
+from cls.health import HealthTracker
+from cls.segment import openSegments, Segments
+from cls.timeindex import row_time
 
 """@package docstring
 File name : control.py
@@ -16,68 +25,147 @@ Materiel : Rasberry Pi zero W
 Revision : V1.2
 """
 
+#___EZO_RESPONSE_CODE___
+
+#first byte of a I2C read, tell if the EZO circuit is done with the last command
+EZO_SUCCESS = 1
+EZO_ERROR = 2
+EZO_PENDING = 254
+EZO_NO_DATA = 255
+
+#first and longest delay between two status polling (in seconds)
+POLL_FIRST = 0.05
+POLL_MAX = 0.2
+
+def openBus(config_file, emulate=False):
+	"""
+	@Name : openBus()
+	@Brief : open the I2C bus of the EZO circuits, the [BUS] section of config.ini choose
+			 between the real bus (smbus) and the software emulation (see emulator.py)
+	@Input arg : (ConfigParser) config_file : the loaded config.ini
+				 (bool) emulate : if True the emulation is used whatever the config
+	@Return : a object with the smbus.SMBus interface
+	"""
+	
+	if emulate or config_file.get("BUS", "driver", fallback="smbus").lower() == "emulator":
+		from cls.emulator import EzoEmulator
+		return EzoEmulator(config_file)
+	
+	#smbus only exist on the Raspberry Pi
+	import smbus
+	return smbus.SMBus(config_file.getint("BUS", "number", fallback=1))
+
 class Control(object):
 	
-	def __init__(self, config_file, bus):
+	def __init__(self, config_file, bus, errors=None):
 		"""
 		@Name : __init__()
 		@Brief : the class constructor
-		@Input arg : n/a
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+					 (SMBus) bus : the I2C bus of the EZO circuits
+					 (ErrorLogger) errors : the shared error log, a new one is made if not given
 		@Return : n/a
 		"""
 		
 		self.config_file = config_file
 		self.bus = bus
+		#name of the bus in the error log, None for the first one (see station.py)
+		self.name = None
+		#error log written in the background
+		self.errors = errors if errors is not None else ErrorLogger(config_file)
+		#last answer of every EZO circuit read while polling, {address : answer}
+		self.response = {}
+		#cache of the mounted partitions, to know if the usb key is there
+		self.mounts = MountCache()
+		#retries and failures of every address, the dead probes are skipped
+		self.health = HealthTracker(config_file)
+		#copy of the local data files to the usb key, in the background
+		self.sync = UsbSync(self)
+		
+		#every row is saved in the journal before the data file, the rows cut by a power loss are written again
+		self.journal = None
+		if config_file.getboolean("RECORD", "journal", fallback=True):
+			self.journal = journal.Journal(config_file.get("PATH", "local") + ".wal")
+			try:
+				if self.journal.recover() != 0:
+					self.log("JOURNAL : ROWS WRITTEN AGAIN AFTER A POWER LOSS")
+			except (IOError, OSError) as e:
+				self.log(str(e), None, self.journal.path, getattr(e, "errno", None))
+		#if True the data files stay open between two writes (daemon mode), {path : file}
+		self.resident = False
+		self.files = {}
+		#the data file is cut in daily segments, compressed by the usb copy thread (see segment.py)
+		self.segments = openSegments(config_file, config_file.get("PATH", "local"), row_time)
 		
 	def write(self, address, string, delay):
 		"""
 		@Name : write()
-		@Brief : write any int to the EZO circuit
+		@Brief : write any int to the EZO circuit and wait until the command is computed
 		@Input arg : (int) address : the address of the EZO circuit we want to write to
 					 (string) string : the string we want to send trough I2C
-		@Return : n/a
+					 (float) delay : the longest time the EZO circuit can take to compute the command
+		@Return : True if the command was sent and computed, else False
 		"""
 		
-		r = True
+		r = self.send(address, string)
 		
-		try:
-			#we send the commend over I2C
-			buffer = []
-			
-			for i in range(len(string)):
-				if i != 0:
-					buffer.append(ord(string[i]))
-
-			self.bus.write_i2c_block_data(address, ord(string[0]), buffer)
-			
-			time.sleep(delay)#we wait for the sensor to compute our command
-			
-		except Exception as e:
-			r = False
-			
-			errorFile = open(self.config_file.get("PATH", "error"), "a")
-			errorFile.write(str(e) + " : " + time.strftime("%H:%M;%d/%m/%Y") + "\n")
-			errorFile.close()
+		if r:
+			#we wait for the sensor to compute our command
+			r = self.wait(address, delay, string) == EZO_SUCCESS
 			
 		return r
 	
+	def send(self, address, string):
+		"""
+		@Name : send()
+		@Brief : send a command to the EZO circuit without waiting for it to be computed,
+				 the caller is responsible for the processing delay (see acquisition.py)
+		@Input arg : (int) address : the address of the EZO circuit we want to write to
+					 (string) string : the string we want to send trough I2C
+		@Return : True if the command was sent, else False
+		"""
+		
+		#we send the commend over I2C
+		buffer = []
+		
+		for i in range(len(string)):
+			if i != 0:
+				buffer.append(ord(string[i]))
+		
+		def action():
+			self.bus.write_i2c_block_data(address, ord(string[0]), buffer)
+			return True
+		
+		return self.transfer(address, string, action) is not None
+	
 	def read(self, adr):
 		"""
 		@Name : read()
-		@Brief : read any EZO circuit
+		@Brief : read any EZO circuit, if the answer was already read while polling it is given back
 		@Input arg : (int) address : the address of the EZO circuit
 		@Return : the answer from the EZO circuit
 		"""
 		
-		buffer = []
+		if adr in self.response:
+			return self.response.pop(adr)
+		
+		buffer = self.transfer(adr, "read", lambda: self.bus.read_i2c_block_data(adr, 0))
+		
+		return self.decode(buffer if buffer is not None else [])
+	
+	def decode(self, buffer):
+		"""
+		@Name : decode()
+		@Brief : convert the bytes read from a EZO circuit to a string
+		@Input arg : (list) buffer : the bytes read, the first one is the response code
+		@Return : the answer from the EZO circuit
+		"""
+		
 		output = ""
 		
-		try :
-			buffer = self.bus.read_i2c_block_data(adr ,0)
-		except Exception as e:
-			errorFile = open(self.config_file.get("PATH", "ERROR"), "a")
-			errorFile.write(str(e) + " : " + time.strftime("%H:%M;%d/%m/%Y") + "\n")
-			errorFile.close()
+		#nothing was read
+		if len(buffer) == 0:
+			return output
 		
 		#we convert a list of int to a string
 		buffer[0] = 0 #we don't read the first char
@@ -89,6 +177,140 @@ class Control(object):
 		output = output.replace("\x00", "")#we earase empty character
 		
 		return output
+	
+	def poll(self, address, command=None):
+		"""
+		@Name : poll()
+		@Brief : read the response code of a EZO circuit, the answer is kept for read() when
+				 the command is done, a syntax error from the circuit is saved in the error log
+		@Input arg : (int) address : the address of the EZO circuit
+					 (string) command : the command we are waiting for, if given a syntax error is logged
+		@Return : the response code (EZO_SUCCESS, EZO_ERROR, EZO_PENDING, EZO_NO_DATA),
+				  None if the bus can't be read
+		"""
+		
+		buffer = self.transfer(address, command, lambda: self.bus.read_i2c_block_data(address, 0))
+		
+		if buffer is None or len(buffer) == 0:
+			return None
+		
+		code = buffer[0]
+		
+		if code == EZO_SUCCESS:
+			self.response[address] = self.decode(buffer)
+		elif code == EZO_ERROR and command is not None:
+			self.log("EZO syntax error", address, command)
+		
+		return code
+	
+	def transfer(self, address, command, action):
+		"""
+		@Name : transfer()
+		@Brief : do a transfer on the I2C bus, a transfer failing with Errno 5 (a glitch on the
+				 bus) is tried again with a growing delay, the other errors (ex: Errno 121, no
+				 circuit at the address) are not. The failures are given to the health tracker.
+		@Input arg : (int) address : the address of the EZO circuit
+					 (string) command : the command sent, used in the error log
+					 (function) action : the transfer
+		@Return : the result of the transfer, None if it failed
+		"""
+		
+		delay = self.health.backoff
+		
+		for attempt in range(self.health.retries + 1):
+			try:
+				return action()
+			except Exception as e:
+				code = getattr(e, "errno", None)
+				
+				if code == errno.EIO and attempt < self.health.retries:
+					self.health.retried(address)
+					time.sleep(delay)
+					delay *= 2
+					continue
+				
+				self.health.failed(address)
+				self.log(str(e), address, command, code)
+				return None
+
+	def wait(self, address, timeout, command=None):
+		"""
+		@Name : wait()
+		@Brief : poll the EZO circuit with a growing delay until the command is computed
+		@Input arg : (int) address : the address of the EZO circuit
+					 (float) timeout : the longest time we wait for the circuit
+					 (string) command : the command we are waiting for, used in the error log
+		@Return : the last response code of the circuit
+		"""
+		
+		start = time.time()
+		backoff = POLL_FIRST
+		
+		while True:
+			remaining = timeout - (time.time() - start)
+			time.sleep(max(0, min(backoff, remaining)))
+			
+			code = self.poll(address, command)
+			
+			if code != EZO_PENDING:
+				break
+			
+			if remaining <= backoff:
+				self.log("EZO timeout", address, command)
+				break
+			
+			backoff = min(backoff * 2, POLL_MAX)
+		
+		return code
+
+	def ready(self, address, timeout):
+		"""
+		@Name : ready()
+		@Brief : wait for the I2C bus and the EZO circuits after the boot, every address is
+				 read until it answer (a read only wake up a sleeping circuit). The errors are
+				 normal while the bus start so they are not logged, the addresses skipped by
+				 the health tracker are not waited for.
+		@Input arg : (list) address : the address of the EZO circuits
+					 (float) timeout : the longest time we wait (in seconds)
+		@Return : (list) the addresses that did not answer, empty when all are ready
+		"""
+		
+		start = time.time()
+		backoff = POLL_FIRST
+		waiting = [adr for adr in address if not self.health.skipped(adr)]
+		
+		while True:
+			for adr in list(waiting):
+				try:
+					self.bus.read_i2c_block_data(adr, 0)
+					waiting.remove(adr)
+				except (IOError, OSError):
+					pass
+		
+			remaining = timeout - (time.time() - start)
+		
+			if len(waiting) == 0 or remaining <= 0:
+				return waiting
+		
+			time.sleep(min(backoff, remaining))
+			backoff = min(backoff * 2, POLL_MAX)
+
+	def log(self, message, address=None, command=None, errno=None):
+		"""
+		@Name : log()
+		@Brief : save a message (error or event of the cycle) in the error log, the message is
+				 written in the background and the repeated ones are counted (see errorlog.py)
+		@Input arg : (string) message : the error or event to save
+					 (int) address : the address of the EZO circuit, if any
+					 (string) command : the command sent to the circuit, if any
+					 (int) errno : the error number of the exception, if any
+		@Return : n/a
+		"""
+		
+		if self.name is not None:
+			message = self.name + " : " + message
+		
+		self.errors.log(message, address, command, errno)
 		
 	def is_number(self, n):
 		"""
@@ -127,34 +349,148 @@ class Control(object):
 		print("	   LOCAL : " + self.config_file.get("PATH", "LOCAL"))
 		print("	   ERROR LOG : " + self.config_file.get("PATH", "ERROR"))	
 
-	def writeData(self, data):
+	def writeData(self, data, sync=False):
 		"""
 		@Name : save()
-		@Brief : right date to the usb key, if no usb key is detected, we save the date locally
-		@Input arg : (string) data : the data we want to save to the usb key
-		@Return : n/a
+		@Brief : right date to the local data file, the rows are then copied to the usb key
+				 in the background (see sync.py), a cycle never wait for the key
+		@Input arg : (string) data : the data we want to save
+					 (bool) sync : if True the data is forced on the storage before returning
+		@Return : (path, offset) the file and the byte offset where the data was written,
+				  None if the data could not be saved
 		"""
 	
 		send = data.replace("\x00", "")
+		path = self.config_file.get("PATH", "local")
 		
-		if (self.is_usb()):
-			try:
-				usb = open(self.config_file.get("PATH", "usb"), "a")
-				usb.write(data)
-				usb.close()
-			except Expetion as e:
-				errorFile = open(self.config_file.get("PATH", "error"), "a")
-				errorFile.write(str(e) + " : " + time.strftime("%H:%M;%d/%m/%Y") + "\n")
-				errorFile.close()
-		else:
-			try:
-				localFile = open(self.config_file.get("PATH", "local"), "a")
-				localFile.write(data)
-				localFile.close()
-			except Expetion as e:
-				errorFile = open(self.config_file.get("PATH", "error"), "a")
-				errorFile.write(str(e) + " : " + time.strftime("%H:%M;%d/%m/%Y") + "\n")
-				errorFile.close()
+		try:
+			if self.segments is not None and self.segments.due(len(send)):
+				self.rotateData(path)
+			
+			dataFile = self.openData(path)
+			#the file is flushed after every write, its size is the offset of the data
+			offset = os.fstat(dataFile.fileno()).st_size
+			
+			"""
+			The row is on the storage once in the journal, so the data
+			file itself is only forced on the storage when the journal
+			is emptied (a row cut is written again at the next start)
+			"""
+			if self.journal is not None:
+				self.journal.append(journal.KIND_APPEND, journal.append_record(path, offset, send.encode("utf-8")), sync)
+			
+			dataFile.write(send)
+			dataFile.flush()
+			
+			if self.journal is None:
+				if sync:
+					os.fsync(dataFile.fileno())
+			elif self.journal.full():
+				os.fsync(dataFile.fileno())
+				self.journal.reset()
+			
+			if not self.resident:
+				self.closeData(path)
+		except Exception as e:
+			self.log(str(e), None, path, getattr(e, "errno", None))
+			self.closeData(path)
+			return None
+		
+		self.sync.request()
+		
+		return (path, offset)
+	
+	def writeBinary(self, records, sync=False):
+		"""
+		@Name : writeBinary()
+		@Brief : append records to the local binary log (see binlog.py), next to the local
+				 data file (data.bin), the records are copied to the usb key like the rows
+		@Input arg : (list) records : the records, (time, station, [readings], status)
+					 (bool) sync : if True the data is forced on the storage before returning
+		@Return : n/a
+		"""
+		
+		path = os.path.splitext(self.config_file.get("PATH", "local"))[0] + ".bin"
+		
+		try:
+			if path not in self.files:
+				self.files[path] = BinaryLog(path)
+			self.files[path].append(records, sync)
+			if not self.resident:
+				self.closeData(path)
+		except Exception as e:
+			self.log(str(e), None, path, getattr(e, "errno", None))
+			self.closeData(path)
+			return
+		
+		self.sync.request()
+	
+	def rotateData(self, path, header=None):
+		"""
+		@Name : rotateData()
+		@Brief : close the data file in a segment (see segment.py), the file is forced on the
+				 storage and the journal emptied first so no row is written again in the new
+				 file after a power loss. The usb copy is stopped during the change.
+		@Input arg : (string) path : the path of the data file
+					 (string) header : the header of the new file, None to keep the old one
+		@Return : n/a
+		"""
+		
+		#a new header without the segments turned on, the old file is moved in the
+		#segments folder but not compressed
+		segments = self.segments
+		if segments is None:
+			segments = Segments(path, None, 0, row_time)
+		
+		with self.sync.lock:
+			self.closeData(path)
+			
+			if self.journal is not None:
+				fd = os.open(path, os.O_RDONLY)
+				try:
+					os.fsync(fd)
+				finally:
+					os.close(fd)
+				self.journal.reset()
+			
+			segments.rotate(True if header is None else header)
+			
+			#the index give offsets in the old file, a new one is made for the new file
+			if os.path.exists(path + ".idx"):
+				os.remove(path + ".idx")
+			
+			#the usb data file is replaced by the segment once it is on the key (see sync.py)
+			open(path + ".rotated", "w").close()
+		
+		self.sync.request()
+	
+	def openData(self, path):
+		"""
+		@Name : openData()
+		@Brief : open a data file in append mode, a file already open is given back
+		@Input arg : (string) path : the path of the data file
+		@Return : the open file
+		"""
+		
+		if path not in self.files:
+			self.files[path] = open(path, "a")
+		
+		return self.files[path]
+	
+	def closeData(self, path=None):
+		"""
+		@Name : closeData()
+		@Brief : close a data file, or all of them
+		@Input arg : (string) path : the path of the data file, None to close all the files
+		@Return : n/a
+		"""
+		
+		for key in list(self.files):
+			if path is None or key == path:
+				try:
+					self.files.pop(key).close()
+				except (IOError, OSError):
+					pass
 	
 	def changeDate(self):
 		"""
@@ -231,8 +567,7 @@ class Control(object):
 				print("\033[1;37;41m" + "Wrong input" + "\033[1;32;40m")
 
 
-		with open("./cfg/config.ini", "w") as file:
-			self.config_file.write(file)
+		self.saveConfig()
 
 	def changePath(self):
 		"""
@@ -268,8 +603,27 @@ class Control(object):
 			else:
 				print("\033[1;37;41m" + "Wrong input" + "\033[1;32;40m")
 
-		with open("./cfg/config.ini", "w") as file:
-			self.config_file.write(file)
+		self.saveConfig()
+
+	def saveConfig(self, path="./cfg/config.ini"):
+		"""
+		@Name : saveConfig()
+		@Brief : save the config in config.ini, the change is saved in the journal of the config
+				 first and the file is replaced in a single step, a power loss never leave a
+				 part of config.ini
+		@Input arg : (string) path : the path of config.ini
+		@Return : n/a
+		"""
+		
+		text = io.StringIO()
+		self.config_file.write(text)
+		content = text.getvalue().encode("utf-8")
+		
+		configJournal = journal.Journal(path + ".wal")
+		configJournal.append(journal.KIND_REPLACE, journal.replace_record(path, content))
+		journal.replace(path, content)
+		configJournal.reset()
+		configJournal.close()
 
 	def Sleep(self, state, adr):
 		"""
@@ -286,20 +640,12 @@ class Control(object):
 		elif state == False:
 			send = "WAKEUP"
 
-		Buffer = []
-
-		#we send our string
-		for i in range(len(send)):
-			if i > 0:
-				Buffer.append(ord(send[i]))
-		try:
-			self.bus.write_i2c_block_data(int(adr), ord(send[0]), Buffer)
-		except Exception as e:
-			errorFile = open(self.config_file.get("PATH", "ERROR"), "a")
-			errorFile.write(str(e) + " : " + time.strftime("%H:%M,%d/%m/%Y") + "\n")
-			errorFile.close()
+		r = self.send(int(adr), send)
 
-		time.sleep(0.9)
+		#a sleeping circuit don't answer and any read would wake it up, so we only wait for the wake up,
+		#the wake up command is not a real EZO command, the circuit can answer with a syntax error
+		if r and state == False:
+			self.wait(int(adr), 0.9)
 	
 	def calibration(self):
 		"""
@@ -543,20 +889,16 @@ class Control(object):
 	def is_usb(self):
 		"""
 		@Name : is_usb()
-		@Brief : print a menu and take the user input to change a selected path, where data is stored 
+		@Brief : look in the mount cache if the usb file is on a mounted partition (ex: /media/usb0),
+				 no process is started, the mount table is only read again when it changed
 		@Input arg : n/a
-		@Return : n/a
+		@Return : the path of the usb file if the key is mounted, else None
 		"""
 		
-		r = False
+		path = self.config_file.get("PATH", "usb")
 		
-		#we start a process to detect all mounted partition
-		proc = subprocess.Popen(["lsblk"], stdout=subprocess.PIPE)
-		
-		#we look for a partition mount in the usb file
-		for line in io.TextIOWrapper(proc.stdout, encoding="utf-8"):
-			if line.find("/media/usb") != -1:
-				r = True
-				break
+		#a path only on the root partition mean the usb key is not mounted
+		if self.mounts.resolve(path) == "/":
+			return None
 		
-		return r
\ No newline at end of file
+		return path
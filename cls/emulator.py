@@ -0,0 +1,256 @@
+"""@package docstring
+File name : emulator.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Software emulation of the EZO circuits (DO, PH, EC, RTD) with the same interface as
+	   smbus.SMBus, used to run the program away from the Raspberry Pi. The commands are
+	   parsed, every command take the time given in the EZO datasheets, the readings
+	   drift after a wake up and Errno 5 faults can be injected.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import time
+import math
+import errno
+import random
+from cls.control import EZO_SUCCESS, EZO_ERROR, EZO_PENDING, EZO_NO_DATA
+from cls.sensors import Registry
+
+
+#___EZO_MODELS___
+
+"""
+Model of every EZO circuit type,
+value : the reading of the probe once stable
+noise : standard deviation of the reading
+drift : error of the first reading after the wake up, it fade with every reading
+fade : number of readings for the drift to fade by 63%
+digits : number of decimals of the answer
+read : time to compute a reading (in seconds)
+"""
+MODELS = {"RTD" : {"value" : 21.0, "noise" : 0.005, "drift" : 0.4, "fade" : 2.0, "digits" : 3, "read" : 0.6},
+		  "EC" : {"value" : 140.0, "noise" : 0.1, "drift" : 8.0, "fade" : 2.0, "digits" : 1, "read" : 0.6},
+		  "PH" : {"value" : 6.8, "noise" : 0.002, "drift" : 0.3, "fade" : 2.5, "digits" : 3, "read" : 0.9},
+		  "DO" : {"value" : 8.2, "noise" : 0.005, "drift" : 0.6, "fade" : 2.0, "digits" : 2, "read" : 0.6},
+		  "ORP" : {"value" : 225.0, "noise" : 0.5, "drift" : 5.0, "fade" : 2.0, "digits" : 1, "read" : 0.9}}
+
+#time to compute the other commands (in seconds)
+DELAY_COMMAND = 0.3
+DELAY_CAL = 0.9
+
+#size of a I2C block read
+BLOCK = 32
+
+
+class EzoDevice(object):
+
+	def __init__(self, kind, rand):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor
+		@Input arg : (string) kind : the type of EZO circuit (RTD, EC, PH, DO)
+					 (Random) rand : the random generator of the emulator
+		@Return : n/a
+		"""
+
+		self.kind = kind
+		self.model = MODELS[kind]
+		self.rand = rand
+
+		self.asleep = True
+		#number of readings since the wake up
+		self.readings = 0
+		#compensation received with the T, and S, commands
+		self.temperature = 25.0
+		self.salinity = 0.0
+		self.calibrated = True
+
+		#answer of the last command and the time it will be ready
+		self.code = EZO_NO_DATA
+		self.answer = ""
+		self.ready = 0.0
+
+	def command(self, string, now):
+		"""
+		@Name : command()
+		@Brief : parse and compute a command sent to the circuit
+		@Input arg : (string) string : the command
+					 (float) now : the time the command was received
+		@Return : n/a
+		"""
+
+		#any command wake up a sleeping circuit
+		self.asleep = False
+
+		fields = string.strip().split(",")
+		name = fields[0].upper()
+		delay = DELAY_COMMAND
+		answer = ""
+		code = EZO_SUCCESS
+
+		if name == "R":
+			delay = self.model["read"]
+			answer = self.reading()
+
+		elif name == "SLEEP":
+			self.asleep = True
+			self.readings = 0
+			code = EZO_NO_DATA
+			delay = 0.0
+
+		elif name == "T" and len(fields) == 2 and fields[1] == "?":
+			answer = "?T," + ("%.2f" % self.temperature)
+
+		elif name == "T" and len(fields) == 2 and self.is_float(fields[1]):
+			self.temperature = float(fields[1])
+
+		elif name == "S" and self.kind == "DO" and len(fields) >= 2 and fields[1] == "?":
+			answer = "?S," + ("%.1f" % self.salinity) + ",uS"
+
+		elif name == "S" and self.kind == "DO" and len(fields) >= 2 and self.is_float(fields[1]):
+			self.salinity = float(fields[1])
+
+		elif name == "CAL":
+			delay = DELAY_CAL
+			if len(fields) == 2 and fields[1] == "?":
+				answer = "?CAL," + ("1" if self.calibrated else "0")
+			else:
+				self.calibrated = not (len(fields) == 2 and fields[1].lower() == "clear")
+
+		elif name == "I":
+			answer = "?I," + self.kind + ",2.0"
+
+		elif name == "STATUS":
+			answer = "?STATUS,P,3.30"
+
+		else:
+			#unknown command (the wake up is not a real EZO command)
+			code = EZO_ERROR
+
+		self.code = code
+		self.answer = answer
+		self.ready = now + delay
+
+	def read(self, now):
+		"""
+		@Name : read()
+		@Brief : the bytes read back from the circuit
+		@Input arg : (float) now : the time of the read
+		@Return : (list) 32 bytes, the response code followed by the answer
+		"""
+
+		if self.asleep:
+			#a read wake up the circuit but it has nothing to say
+			self.asleep = False
+			return [EZO_NO_DATA] + [0] * (BLOCK - 1)
+
+		if now < self.ready:
+			return [EZO_PENDING] + [0] * (BLOCK - 1)
+
+		buffer = [self.code] + [ord(c) for c in self.answer[:BLOCK - 2]]
+
+		return buffer + [0] * (BLOCK - len(buffer))
+
+	def reading(self):
+		"""
+		@Name : reading()
+		@Brief : take a reading, the drift after the wake up fade with every reading
+		@Input arg : n/a
+		@Return : the reading as a string
+		"""
+
+		drift = self.model["drift"] * math.exp(-self.readings / self.model["fade"])
+		value = self.model["value"] + drift + self.rand.gauss(0.0, self.model["noise"])
+		self.readings += 1
+
+		return ("%." + str(self.model["digits"]) + "f") % value
+
+	def is_float(self, n):
+		"""
+		@Name : is_float()
+		@Brief : return "true" if the string "n" is a decimal number, else return "false"
+		@Input arg : n : the string that need verification
+		@Return : true or false
+		"""
+
+		try:
+			float(n)
+		except ValueError:
+			return False
+
+		return True
+
+
+class EzoEmulator(object):
+
+	def __init__(self, config_file, clock=None, seed=None):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, a EZO circuit is emulated for every address of config.ini,
+				 the [EMULATOR] section give the chance of a Errno 5 fault on every transaction
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+					 (function) clock : give the time in seconds, time.time if not given
+					 (int) seed : seed of the random generator, for repeatable runs
+		@Return : n/a
+		"""
+
+		self.clock = clock if clock is not None else time.time
+		self.rand = random.Random(seed)
+		self.fault = config_file.getfloat("EMULATOR", "fault", fallback=0.0)
+
+		#number of transactions done on the bus, for the benchmarks
+		self.transactions = 0
+
+		self.devices = {}
+		#the type of every probe of [ADDRESS] is given by the sensor registry
+		for sensor in Registry(config_file).sensors:
+			if sensor.kind in MODELS:
+				self.devices[sensor.address] = EzoDevice(sensor.kind, self.rand)
+
+	def write_i2c_block_data(self, address, cmd, data):
+		"""
+		@Name : write_i2c_block_data()
+		@Brief : same as smbus, send a command to a EZO circuit
+		@Input arg : (int) address : the address of the EZO circuit
+					 (int) cmd : the first char of the command
+					 (list) data : the other chars of the command
+		@Return : n/a
+		"""
+
+		device = self.transaction(address)
+		device.command(chr(cmd) + "".join(chr(c) for c in data), self.clock())
+
+	def read_i2c_block_data(self, address, cmd):
+		"""
+		@Name : read_i2c_block_data()
+		@Brief : same as smbus, read the answer of a EZO circuit
+		@Input arg : (int) address : the address of the EZO circuit
+					 (int) cmd : not used by the EZO circuits
+		@Return : (list) 32 bytes, the response code followed by the answer
+		"""
+
+		device = self.transaction(address)
+		return device.read(self.clock())
+
+	def transaction(self, address):
+		"""
+		@Name : transaction()
+		@Brief : count a transaction on the bus and raise the errors of a real bus
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : the emulated circuit at the address
+		"""
+
+		self.transactions += 1
+
+		#nothing answer at this address
+		if address not in self.devices:
+			raise OSError(errno.EREMOTEIO, "Remote I/O error")
+
+		#injected fault
+		if self.fault > 0 and self.rand.random() < self.fault:
+			raise OSError(errno.EIO, "Input/output error")
+
+		return self.devices[address]
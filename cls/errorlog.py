@@ -0,0 +1,280 @@
+"""@package docstring
+File name : errorlog.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Error log shared by all the program, the messages are written by a background
+	   thread so a failing probe never slow down the measures. The same error repeated
+	   is saved once with a count, the log file is rotated by size and the bytes written
+	   per minute are capped so the SD card can't be filled. With the segments turned on
+	   the old logs are compressed in err/segments instead (see segment.py).
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+import re
+import queue
+import atexit
+import threading
+from cls.segment import openSegments
+
+
+#___DEFAULT_CONFIG___
+
+#default values when missing from the [ERROR] section of config.ini
+MAX_SIZE = 262144		#size of the log before it is rotated (in bytes)
+BACKUPS = 3				#number of old logs kept (errorlog.txt.1, errorlog.txt.2 ...)
+BURST = 60.0			#identical errors in this time are saved once with a count (in seconds)
+RATE = 8192				#most bytes written in the log per minute
+QUEUE_SIZE = 256		#messages waiting for the thread, the next ones are dropped
+
+#time of a line of the log, "message : HH:MM;DD/MM/YYYY ..."
+LINE_TIME = re.compile(r" : (\d\d:\d\d;\d\d/\d\d/\d\d\d\d)")
+
+
+class ErrorLogger(object):
+
+	def __init__(self, config_file):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, start the thread writing the log
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+		@Return : n/a
+		"""
+
+		self.path = config_file.get("PATH", "error")
+		self.max_size = config_file.getint("ERROR", "max_size", fallback=MAX_SIZE)
+		self.backups = config_file.getint("ERROR", "backups", fallback=BACKUPS)
+		self.burst = config_file.getfloat("ERROR", "burst", fallback=BURST)
+		self.rate = config_file.getint("ERROR", "rate", fallback=RATE)
+		#daily segments compressed by this thread, replace the backups if turned on
+		self.segments = openSegments(config_file, self.path, log_time, self.max_size)
+
+		self.queue = queue.Queue(QUEUE_SIZE)
+		#messages dropped because the queue was full or the rate was reached
+		self.dropped = 0
+
+		#errors seen in the current burst, {(message, address, command, errno) : [first time, count]}
+		self.bursts = {}
+
+		#bytes written in the current minute
+		self.budget = self.rate
+		self.minute = time.time()
+
+		self.thread = threading.Thread(target=self.run, name="errorlog")
+		self.thread.daemon = True
+		self.thread.start()
+
+		#the messages left are written when the program stop
+		atexit.register(self.close)
+
+	def log(self, message, address=None, command=None, errno=None):
+		"""
+		@Name : log()
+		@Brief : give a message to the thread writing the log, never block
+		@Input arg : (string) message : the error or event to save
+					 (int) address : the address of the EZO circuit, if any
+					 (string) command : the command sent to the circuit, if any
+					 (int) errno : the error number of the exception, if any
+		@Return : n/a
+		"""
+
+		try:
+			self.queue.put_nowait((time.time(), message, address, command, errno))
+		except queue.Full:
+			self.dropped += 1
+
+	def close(self):
+		"""
+		@Name : close()
+		@Brief : stop the thread once all the messages are written
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if not self.thread.is_alive():
+			return
+
+		try:
+			self.queue.put(None, timeout=1.0)
+		except queue.Full:
+			return
+
+		self.thread.join(2.0)
+
+	def run(self):
+		"""
+		@Name : run()
+		@Brief : main loop of the thread, write the messages and close the bursts
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		while True:
+			try:
+				item = self.queue.get(timeout=self.burst)
+			except queue.Empty:
+				item = False
+
+			if item is None:
+				#the program is stopping, the bursts are closed
+				self.expire(None)
+				self.report()
+				break
+
+			if item:
+				self.receive(item)
+
+			self.expire(time.time())
+
+	def receive(self, item):
+		"""
+		@Name : receive()
+		@Brief : write a new message, or count it if it's already in a burst
+		@Input arg : (tuple) item : (time, message, address, command, errno)
+		@Return : n/a
+		"""
+
+		stamp, message, address, command, errno = item
+		key = (message, address, command, errno)
+
+		if key in self.bursts:
+			self.bursts[key][1] += 1
+			return
+
+		self.bursts[key] = [stamp, 0]
+		self.write(self.format(stamp, key, 1))
+
+	def expire(self, now):
+		"""
+		@Name : expire()
+		@Brief : close the bursts older than the burst time, the count of the repeated
+				 message is saved
+		@Input arg : (float) now : the time, None to close all the bursts
+		@Return : n/a
+		"""
+
+		for key in list(self.bursts):
+			first, count = self.bursts[key]
+
+			if now is None or now - first >= self.burst:
+				del self.bursts[key]
+				if count != 0:
+					self.write(self.format(first, key, count, True))
+
+	def format(self, stamp, key, count, repeated=False):
+		"""
+		@Name : format()
+		@Brief : build the line of the log, the old "message : time" format followed by the fields
+		@Input arg : (float) stamp : the time of the message
+					 (tuple) key : (message, address, command, errno)
+					 (int) count : the number of time the message was seen
+					 (bool) repeated : True for the line closing a burst
+		@Return : the line
+		"""
+
+		message, address, command, errno = key
+
+		line = message + " : " + time.strftime("%H:%M;%d/%m/%Y", time.localtime(stamp))
+
+		if address is not None:
+			line += " ; adr=" + str(address)
+		if command is not None:
+			line += " ; cmd=" + str(command)
+		if errno is not None:
+			line += " ; errno=" + str(errno)
+		if repeated:
+			line += " ; repeated x" + str(count)
+
+		return line + "\n"
+
+	def write(self, line):
+		"""
+		@Name : write()
+		@Brief : append a line to the log if the rate allow it, rotate the log when it's too big
+		@Input arg : (string) line : the line to save
+		@Return : n/a
+		"""
+
+		#a new minute, the budget is full again and the dropped messages are reported
+		now = time.time()
+		if now - self.minute >= 60.0:
+			self.minute = now
+			self.budget = self.rate
+			self.report()
+
+		if len(line) > self.budget:
+			self.dropped += 1
+			return
+
+		self.budget -= len(line)
+
+		try:
+			if self.segments is not None:
+				if self.segments.due(len(line)):
+					self.segments.rotate()
+					self.segments.compress()
+			elif os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_size:
+				self.rotate()
+
+			errorFile = open(self.path, "a")
+			errorFile.write(line)
+			errorFile.close()
+		except (IOError, OSError):
+			self.dropped += 1
+
+	def report(self):
+		"""
+		@Name : report()
+		@Brief : save the number of messages dropped since the last report
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.dropped != 0:
+			dropped = self.dropped
+			self.dropped = 0
+			self.write("LOG DROPPED " + str(dropped) + " MESSAGES : " + time.strftime("%H:%M;%d/%m/%Y") + "\n")
+
+	def rotate(self):
+		"""
+		@Name : rotate()
+		@Brief : rename the log to errorlog.txt.1, the older ones are shifted and the last removed
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		for i in range(self.backups, 0, -1):
+			old = self.path + "." + str(i)
+
+			if i == self.backups and os.path.exists(old):
+				os.remove(old)
+			elif os.path.exists(old):
+				os.rename(old, self.path + "." + str(i + 1))
+
+		if self.backups > 0:
+			os.rename(self.path, self.path + ".1")
+		else:
+			os.remove(self.path)
+
+
+def log_time(line):
+	"""
+	@Name : log_time()
+	@Brief : read the time of a line of the log, for the manifest of the segments
+	@Input arg : (string) line : the line
+	@Return : the time in seconds since 1970, None if the line has no time
+	"""
+
+	match = LINE_TIME.search(line)
+
+	if match is None:
+		return None
+
+	try:
+		return time.mktime(time.strptime(match.group(1), "%H:%M;%d/%m/%Y"))
+	except ValueError:
+		return None
@@ -0,0 +1,209 @@
+"""@package docstring
+File name : health.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Health of every EZO circuit, the transfers failing on the I2C bus are counted per
+	   address. A address failing many cycles in a row is skipped for some cycles (open
+	   circuit) then tried again, so a dead or unplugged probe cost nothing to the cycle.
+	   The state is saved in health.json next to data.csv to be kept after a reboot, the
+	   health of the probes of a cycle is saved in the data row.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import json
+
+
+#___DEFAULT_CONFIG___
+
+#default values when missing from the [HEALTH] section of config.ini
+RETRIES = 3			#number of retries of a transfer failing with Errno 5
+BACKOFF = 0.01		#delay before the first retry, doubled at every retry (in seconds)
+THRESHOLD = 3		#failed cycles in a row before the address is skipped
+COOLDOWN = 10		#number of cycles the address is skipped
+
+"""
+Health flags of the data row, with n probes in the row the flag of the probe i is
+(1 << (FLAG * n + i)), so with the 4 standard probes the flag is (HEALTH_... << i)
+HEALTH_RETRY : a transfer failed and worked when tried again
+HEALTH_FAIL : the probe gave no reading in this cycle
+HEALTH_SKIP : the probe was skipped (open circuit)
+"""
+HEALTH_RETRY = 1
+HEALTH_FAIL = 1 << 4
+HEALTH_SKIP = 1 << 8
+
+
+class HealthTracker(object):
+
+	def __init__(self, config_file):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the state saved is read back
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+		@Return : n/a
+		"""
+
+		self.retries = config_file.getint("HEALTH", "retries", fallback=RETRIES)
+		self.backoff = config_file.getfloat("HEALTH", "backoff", fallback=BACKOFF)
+		self.threshold = config_file.getint("HEALTH", "threshold", fallback=THRESHOLD)
+		self.cooldown = config_file.getint("HEALTH", "cooldown", fallback=COOLDOWN)
+		self.path = os.path.join(os.path.dirname(config_file.get("PATH", "local")), "health.json")
+
+		#saved state, {address : [failed cycles in a row, cycles left to skip]}
+		self.state = {}
+		#what happened to every address in the current cycle, {address : flags}
+		self.flags = {}
+		#addresses with a transfer failed in the current cycle
+		self.broken = set()
+
+		#no file when all the addresses are healthy
+		if not os.path.exists(self.path):
+			return
+
+		try:
+			with open(self.path, "r") as healthFile:
+				for key, value in json.load(healthFile).items():
+					self.state[int(key)] = [int(value[0]), int(value[1])]
+		except (IOError, OSError, ValueError, TypeError, IndexError, AttributeError):
+			self.state = {}
+
+	def allow(self, address):
+		"""
+		@Name : allow()
+		@Brief : tell if a address is used in this cycle, called once per cycle, a address
+				 skipped count down its cycles and is tried again at the end
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : True if the address is used, False if it is skipped
+		"""
+
+		self.broken.discard(address)
+		state = self.state.get(address)
+
+		if state is None or state[1] <= 0:
+			return True
+
+		state[1] -= 1
+		self.flag(address, HEALTH_SKIP)
+		return False
+
+	def skipped(self, address):
+		"""
+		@Name : skipped()
+		@Brief : tell if a address will be skipped in the next cycle, without counting it
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : true or false
+		"""
+
+		state = self.state.get(address)
+
+		return state is not None and state[1] > 0
+
+	def flag(self, address, flag):
+		"""
+		@Name : flag()
+		@Brief : save what happened to a address, for the data row (see mask())
+		@Input arg : (int) address : the address of the EZO circuit
+					 (int) flag : HEALTH_RETRY, HEALTH_FAIL or HEALTH_SKIP
+		@Return : n/a
+		"""
+
+		self.flags[address] = self.flags.get(address, 0) | flag
+
+	def retried(self, address):
+		"""
+		@Name : retried()
+		@Brief : a transfer failed and is tried again
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : n/a
+		"""
+
+		self.flag(address, HEALTH_RETRY)
+
+	def failed(self, address):
+		"""
+		@Name : failed()
+		@Brief : a transfer failed and was not tried again (or all the retries failed)
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : n/a
+		"""
+
+		self.broken.add(address)
+
+	def finish(self, address, success):
+		"""
+		@Name : finish()
+		@Brief : end the cycle of a address, a address failing "threshold" cycles in a row
+				 is skipped for "cooldown" cycles
+		@Input arg : (int) address : the address of the EZO circuit
+					 (bool) success : True if the probe gave a reading
+		@Return : n/a
+		"""
+
+		if success:
+			self.state.pop(address, None)
+			return
+
+		self.flag(address, HEALTH_FAIL)
+		state = self.state.setdefault(address, [0, 0])
+		state[0] += 1
+
+		if state[0] >= self.threshold:
+			state[1] = self.cooldown
+
+	def mask(self, address):
+		"""
+		@Name : mask()
+		@Brief : the health of the probes since the last call, saved in the data row
+		@Input arg : (list) address : the address of the probes, in the order of the row
+		@Return : (int) the flags of all the probes (see HEALTH_...), 0 if all are healthy
+		"""
+
+		mask = 0
+
+		for i, adr in enumerate(address):
+			for k, flag in enumerate([HEALTH_RETRY, HEALTH_FAIL, HEALTH_SKIP]):
+				if self.flags.get(adr, 0) & flag:
+					mask |= 1 << (k * len(address) + i)
+
+		self.flags = {}
+
+		return mask
+
+	def save(self, previous):
+		"""
+		@Name : save()
+		@Brief : save the state in health.json if it changed, the file is removed when all the
+				 addresses are healthy again, a healthy station never write it
+		@Input arg : (dict) previous : the state before the cycle (see snapshot())
+		@Return : n/a
+		"""
+
+		if previous == self.state:
+			return
+
+		temp = self.path + ".tmp"
+
+		try:
+			if len(self.state) == 0:
+				os.remove(self.path)
+				return
+
+			with open(temp, "w") as healthFile:
+				json.dump(dict((str(key), value) for key, value in self.state.items()), healthFile)
+			os.replace(temp, self.path)
+		except (IOError, OSError):
+			pass
+
+	def snapshot(self):
+		"""
+		@Name : snapshot()
+		@Brief : copy the state, to know at the end of the cycle if it changed
+		@Input arg : n/a
+		@Return : (dict) the copy
+		"""
+
+		return dict((key, list(value)) for key, value in self.state.items())
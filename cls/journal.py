@@ -0,0 +1,330 @@
+"""@package docstring
+File name : journal.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Write-ahead journal of the data rows and of the config changes, a power cut of the
+	   Witty Pi can happen at any time. Every change is saved in the journal with a sequence
+	   number and a checksum before it is done, at the start of the program the changes of
+	   the journal are checked and done again if they were cut. A torn journal record is
+	   dropped, the change it hold was never started. The journal stay small so the
+	   check take a few milliseconds.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import zlib
+import struct
+
+
+#___JOURNAL_FORMAT___
+
+"""
+Record : magic, kind, sequence number, size of the payload, crc32 of the header (without
+the crc) and of the payload, followed by the payload
+"""
+HEADER = struct.Struct("<2sBxIII")
+MAGIC = b"WJ"
+
+#append of data to a file, payload : offset (8 bytes), size of the path (2 bytes), path, data
+KIND_APPEND = 1
+APPEND = struct.Struct("<QH")
+
+#new content of a file (config.ini), payload : size of the path (2 bytes), path, content
+KIND_REPLACE = 2
+REPLACE = struct.Struct("<H")
+
+#the journal is emptied when bigger than this, once the changes are on the storage (in bytes)
+LIMIT = 16384
+
+
+class Journal(object):
+
+	def __init__(self, path):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the journal is opened at the first record
+		@Input arg : (string) path : the path of the journal (ex: data/data.csv.wal)
+		@Return : n/a
+		"""
+
+		self.path = path
+		self.fd = None
+		#sequence number of the next record and size of the journal
+		self.sequence = 0
+		self.size = 0
+
+	def append(self, kind, payload, sync=True):
+		"""
+		@Name : append()
+		@Brief : save a record before the change it hold is done
+		@Input arg : (int) kind : the kind of change (KIND_APPEND, KIND_REPLACE)
+					 (bytes) payload : the change
+					 (bool) sync : if True the record is forced on the storage before returning
+		@Return : n/a
+		"""
+
+		if self.fd is None:
+			self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+			self.size = os.fstat(self.fd).st_size
+
+		header = HEADER.pack(MAGIC, kind, self.sequence, len(payload), 0)
+		crc = zlib.crc32(payload, zlib.crc32(header[:-4])) & 0xFFFFFFFF
+
+		#a single write, the record is never mixed with another one
+		os.write(self.fd, header[:-4] + struct.pack("<I", crc) + payload)
+		if sync:
+			os.fsync(self.fd)
+
+		self.sequence += 1
+		self.size += HEADER.size + len(payload)
+
+	def full(self):
+		"""
+		@Name : full()
+		@Brief : tell if the journal should be emptied (see reset())
+		@Input arg : n/a
+		@Return : true or false
+		"""
+
+		return self.size >= LIMIT
+
+	def reset(self):
+		"""
+		@Name : reset()
+		@Brief : empty the journal, the changes it hold must be on the storage before
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.fd is None:
+			self.fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+		os.ftruncate(self.fd, 0)
+		os.fsync(self.fd)
+		self.size = 0
+
+	def close(self):
+		"""
+		@Name : close()
+		@Brief : close the journal
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.fd is not None:
+			os.close(self.fd)
+			self.fd = None
+
+	def records(self):
+		"""
+		@Name : records()
+		@Brief : read the valid records of the journal, the reading stop at the first torn
+				 record (bad checksum, cut by a power loss)
+		@Input arg : n/a
+		@Return : (list) the records, (sequence, kind, payload)
+		"""
+
+		try:
+			with open(self.path, "rb") as journalFile:
+				data = journalFile.read()
+		except (IOError, OSError):
+			return []
+
+		records = []
+		offset = 0
+		last = None
+
+		while offset + HEADER.size <= len(data):
+			magic, kind, sequence, size, crc = HEADER.unpack_from(data, offset)
+			end = offset + HEADER.size + size
+
+			if magic != MAGIC or end > len(data):
+				break
+
+			payload = data[offset + HEADER.size:end]
+			if zlib.crc32(payload, zlib.crc32(data[offset:offset + HEADER.size - 4])) & 0xFFFFFFFF != crc:
+				break
+
+			#the records are in order, a older one is from a journal emptied before
+			if last is not None and sequence <= last:
+				break
+
+			records.append((sequence, kind, payload))
+			last = sequence
+			offset = end
+
+		return records
+
+	def recover(self):
+		"""
+		@Name : recover()
+		@Brief : do again the changes of the journal that are not complete on the storage,
+				 then empty the journal. A change done again give the same file, the changes
+				 complete are only read. Every file of the journal is forced on the storage
+				 before the journal is emptied, a change read from the cache after a crash of
+				 the program may not be on the storage yet.
+		@Input arg : n/a
+		@Return : (int) the number of changes done again
+		"""
+
+		if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+			return 0
+
+		done = 0
+		#the files repaired or checked
+		paths = []
+
+		for sequence, kind, payload in self.records():
+			if kind == KIND_APPEND:
+				offset, size = APPEND.unpack_from(payload)
+				path = payload[APPEND.size:APPEND.size + size].decode("utf-8")
+				done += repair(path, offset, payload[APPEND.size + size:])
+
+			elif kind == KIND_REPLACE:
+				size, = REPLACE.unpack_from(payload)
+				path = payload[REPLACE.size:REPLACE.size + size].decode("utf-8")
+				content = payload[REPLACE.size + size:]
+				if not same(path, 0, content, True):
+					replace(path, content)
+					done += 1
+
+			if path not in paths:
+				paths.append(path)
+
+			self.sequence = sequence + 1
+
+		for path in paths:
+			flush(path)
+
+		self.reset()
+		self.close()
+
+		return done
+
+
+def append_record(path, offset, data):
+	"""
+	@Name : append_record()
+	@Brief : make the payload of a append
+	@Input arg : (string) path : the file
+				 (int) offset : where the data is written in the file
+				 (bytes) data : the data
+	@Return : (bytes) the payload
+	"""
+
+	name = path.encode("utf-8")
+
+	return APPEND.pack(offset, len(name)) + name + data
+
+
+def replace_record(path, content):
+	"""
+	@Name : replace_record()
+	@Brief : make the payload of a file replaced
+	@Input arg : (string) path : the file
+				 (bytes) content : the new content of the file
+	@Return : (bytes) the payload
+	"""
+
+	name = path.encode("utf-8")
+
+	return REPLACE.pack(len(name)) + name + content
+
+
+def same(path, offset, data, whole=False):
+	"""
+	@Name : same()
+	@Brief : check if a file hold the data at the offset
+	@Input arg : (string) path : the file
+				 (int) offset : where the data should be
+				 (bytes) data : the data
+				 (bool) whole : if True the file must end with the data
+	@Return : true or false
+	"""
+
+	try:
+		with open(path, "rb") as checkFile:
+			checkFile.seek(offset)
+			found = checkFile.read(len(data) + (1 if whole else 0))
+	except (IOError, OSError):
+		return False
+
+	return found == data
+
+
+def repair(path, offset, data):
+	"""
+	@Name : repair()
+	@Brief : write again a append that was cut, only at the end of the file, the file is
+			 cut back to the offset
+	@Input arg : (string) path : the file
+				 (int) offset : where the data is written in the file
+				 (bytes) data : the data
+	@Return : (int) 1 if the data was written again, else 0
+	"""
+
+	if not os.path.exists(path):
+		return 0
+
+	size = os.path.getsize(path)
+
+	#the file was moved or emptied since, or other data follow (the file was changed
+	#by hand), the data can't be put back at its place
+	if size < offset or size > offset + len(data):
+		return 0
+
+	if same(path, offset, data):
+		return 0
+
+	fd = os.open(path, os.O_WRONLY)
+	try:
+		os.ftruncate(fd, offset)
+		os.lseek(fd, offset, os.SEEK_SET)
+		os.write(fd, data)
+		os.fsync(fd)
+	finally:
+		os.close(fd)
+
+	return 1
+
+
+def flush(path):
+	"""
+	@Name : flush()
+	@Brief : force a file on the storage, a file missing is not a error
+	@Input arg : (string) path : the file
+	@Return : n/a
+	"""
+
+	try:
+		fd = os.open(path, os.O_RDONLY)
+	except (IOError, OSError):
+		return
+
+	try:
+		os.fsync(fd)
+	finally:
+		os.close(fd)
+
+
+def replace(path, content):
+	"""
+	@Name : replace()
+	@Brief : replace the content of a file in a single step, a power loss leave the old or
+			 the new file but never a part of it
+	@Input arg : (string) path : the file
+				 (bytes) content : the new content
+	@Return : n/a
+	"""
+
+	temp = path + ".tmp"
+
+	with open(temp, "wb") as tempFile:
+		tempFile.write(content)
+		tempFile.flush()
+		os.fsync(tempFile.fileno())
+
+	os.replace(temp, path)
@@ -0,0 +1,494 @@
+"""@package docstring
+File name : loader.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Loader of the data.csv files into NumPy arrays, for the analysis on a computer (NumPy
+	   is not needed on the Raspberry Pi). The file is read by chunks of a few MB, the rows
+	   with the normal format are converted all at once by NumPy and only the other rows
+	   (truncated rows, extra fields, blank lines...) are read one by one. A bad row is
+	   kept with a reason code instead of stopping the load.
+	   Use : for chunk in loader.chunks("data.csv"): chunk["PH"], chunk["reason"]...
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import gzip
+import numpy as np
+
+
+#___LOADER_CONFIG___
+
+#size of the chunks read from the file (in bytes)
+CHUNK = 4 * 1024 * 1024
+
+#the reading columns of data.csv, in order
+PROBES = ["TEMP", "CON", "PH", "DO"]
+
+#number of fields kept after the 4 readings of a row with extra fields
+EXTRA = 4
+
+"""
+Reason codes, bits of the "reason" column (0 for a good row),
+REASON_TRUNCATED : less than 4 readings, the missing ones are NaN
+REASON_EXTRA : more than 4 readings (and the health) and more fields than the header, the
+			   others are in the "extra" column
+REASON_NUMBER : a reading is not a number (NaN), or is empty
+REASON_TIME : the time or the date is not valid (NaT)
+"""
+REASON_TRUNCATED = 1
+REASON_EXTRA = 2
+REASON_NUMBER = 4
+REASON_TIME = 8
+
+#the longest reading read by NumPy, the longer ones are read one by one
+WIDTH = 15
+
+#the digits of the time and date fields ("HH:MM", "HH:MM:SS", "DD/MM/YYYY") and their separators
+CLOCK = {5 : ([0, 1, 3, 4], [2]), 8 : ([0, 1, 3, 4, 6, 7], [2, 5])}
+DATE = ([0, 1, 3, 4, 6, 7, 8, 9], [2, 5])
+
+
+def chunks(path, size=CHUNK, extra=EXTRA):
+	"""
+	@Name : chunks()
+	@Brief : read a data.csv file one chunk at a time, the memory used stay the same for
+			 any size of file, the blank lines and the header are skipped. The columns
+			 of the header after HEALTH (other probes, statistics of the "stats" mode)
+			 are read in a array of their name.
+	@Input arg : (string) path : the path of the data file, or of a compressed segment (.gz)
+				 (int) size : the size of the chunks read (in bytes)
+				 (int) extra : the number of extra fields kept per row
+	@Return : a generator of dict of arrays, one value per row,
+			  "time" (datetime64[s], the time written in the file, NaT if not valid),
+			  "TEMP", "CON", "PH", "DO" (float64, NaN if missing), "extra" (float64, extra
+			  columns per row), "HEALTH" (float64, the health flags of the probes, see
+			  health.py, NaN for the rows written before), "reason" (uint8, see REASON_...),
+			  "line" (int64, from 1), and one array (float64) per column of the header
+			  after HEALTH (ex : "ORP", "PH_MEAN")
+	"""
+
+	line = 1
+	rest = b""
+
+	with (gzip.open(path, "rb") if path.endswith(".gz") else open(path, "rb")) as dataFile:
+		#the header give the columns after the health, the first line is read again
+		#with the data if it is not a header
+		rest = dataFile.readline()
+		names = columns(rest)
+		if rest.startswith(b"TIME"):
+			rest = b""
+			line = 2
+
+		while True:
+			data = dataFile.read(size)
+			done = len(data) == 0
+
+			data = rest + data
+
+			#the last line of the chunk can be cut, it is kept for the next chunk
+			if not done:
+				end = data.rfind(b"\n") + 1
+				if end == 0:
+					rest = data
+					continue
+				data, rest = data[:end], data[end:]
+			elif len(data) == 0:
+				break
+
+			chunk = parse(data, line, extra, names)
+			line += data.count(b"\n")
+
+			if len(chunk["line"]) != 0:
+				yield chunk
+
+			if done:
+				break
+
+
+def load(path, extra=EXTRA):
+	"""
+	@Name : load()
+	@Brief : read a whole data.csv file, the chunks are joined (see chunks())
+	@Input arg : (string) path : the path of the data file
+				 (int) extra : the number of extra fields kept per row
+	@Return : (dict) the arrays of all the rows
+	"""
+
+	parts = list(chunks(path, extra=extra))
+
+	if len(parts) == 0:
+		return empty(0, extra)
+
+	return dict((key, np.concatenate([part[key] for part in parts])) for key in parts[0])
+
+
+def summary(chunk):
+	"""
+	@Name : summary()
+	@Brief : count the rows of every reason code
+	@Input arg : (dict) chunk : the arrays given by chunks() or load()
+	@Return : (dict) {"rows", "good", "truncated", "extra", "number", "time"}
+	"""
+
+	reason = chunk["reason"]
+
+	return {"rows" : int(len(reason)),
+			"good" : int(np.count_nonzero(reason == 0)),
+			"truncated" : int(np.count_nonzero(reason & REASON_TRUNCATED)),
+			"extra" : int(np.count_nonzero(reason & REASON_EXTRA)),
+			"number" : int(np.count_nonzero(reason & REASON_NUMBER)),
+			"time" : int(np.count_nonzero(reason & REASON_TIME))}
+
+
+def columns(header):
+	"""
+	@Name : columns()
+	@Brief : the columns of the header of data.csv after HEALTH (see sensors.py)
+	@Input arg : (bytes) header : the first line of the file
+	@Return : (list) the names, empty for a file without header or without health
+	"""
+
+	if not header.startswith(b"TIME"):
+		return []
+
+	fields = [field.strip() for field in header.decode("ascii", "replace").split(";")]
+	fields = [field for field in fields if field != ""]
+
+	if "HEALTH" not in fields:
+		return []
+
+	return fields[fields.index("HEALTH") + 1:]
+
+
+def empty(count, extra, names=()):
+	"""
+	@Name : empty()
+	@Brief : make the arrays of a chunk, filled with NaT and NaN
+	@Input arg : (int) count : the number of rows
+				 (int) extra : the number of extra fields kept per row
+				 (list) names : the columns of the header after HEALTH
+	@Return : (dict) the arrays
+	"""
+
+	chunk = {"time" : np.full(count, np.datetime64("NaT"), dtype="datetime64[s]"),
+			 "extra" : np.full((count, extra), np.nan),
+			 "HEALTH" : np.full(count, np.nan),
+			 "reason" : np.zeros(count, dtype=np.uint8),
+			 "line" : np.zeros(count, dtype=np.int64)}
+
+	for probe in PROBES + list(names):
+		chunk[probe] = np.full(count, np.nan)
+
+	return chunk
+
+
+def parse(data, first, extra, names=()):
+	"""
+	@Name : parse()
+	@Brief : convert the complete lines of a chunk, the rows "HH:MM;DD/MM/YYYY;a;b;c;d;"
+			 and "HH:MM;DD/MM/YYYY;a;b;c;d;health;" (and HH:MM:SS of the stream mode) are
+			 converted by NumPy, the others by slow()
+	@Input arg : (bytes) data : the lines, ending with a new line (except at the end of the file)
+				 (int) first : the number of the first line in the file
+				 (int) extra : the number of extra fields kept per row
+				 (list) names : the columns of the header after HEALTH
+	@Return : (dict) the arrays of the rows, in the order of the file
+	"""
+
+	#the zeros after the data let the fields be read past the end of the last line
+	raw = np.frombuffer(data + bytes(WIDTH + 16), dtype=np.uint8)
+
+	#start and end of every line, only the position of the separators are kept
+	ends = np.flatnonzero(raw == 10)
+	if data[-1:] != b"\n":
+		ends = np.append(ends, len(data))
+	starts = np.concatenate(([0], ends[:-1] + 1))
+
+	semicolons = np.flatnonzero(raw == 59)
+	firsts = np.searchsorted(semicolons, starts)
+	count = np.searchsorted(semicolons, ends) - firsts
+
+	#the line end with a ";" (before the "\r" of a Windows file)
+	last = np.maximum(ends - 1, 0)
+	last = np.where((raw[last] == 13) & (last > starts), last - 1, last)
+
+	#every char of a normal row is checked with its field below
+	normal = np.flatnonzero(((count == 6) | (count == 7)) & (raw[last] == 59) & (ends > starts))
+
+	#position of the first 6 ";" of every normal row
+	fields = semicolons[firsts[normal][:, None] + np.arange(6)]
+	lines = starts[normal]
+
+	chunk = empty(len(normal), extra, names)
+	ok = np.ones(len(normal), dtype=bool)
+
+	#the time, HH:MM or HH:MM:SS
+	length = fields[:, 0] - lines
+	hms = np.zeros((len(normal), 3))
+
+	for size in CLOCK:
+		group = length == size
+		values, good = digits(raw, lines[group], size, CLOCK[size])
+		hms[group, :len(values)] = np.array(values).T
+		ok[group] &= good
+
+	ok &= (length == 5) | (length == 8)
+
+	#the date, DD/MM/YYYY
+	ok &= fields[:, 1] - fields[:, 0] == 11
+	dmy, good = digits(raw, fields[:, 0] + 1, 10, DATE)
+	ok &= good
+
+	chunk["time"], bad = stamp(dmy[2], dmy[1], dmy[0], hms[:, 0], hms[:, 1], hms[:, 2])
+	chunk["reason"][bad] |= REASON_TIME
+
+	#the readings, all the probes are read together
+	values, good = numbers(raw, fields[:, 1:5].T.ravel() + 1, fields[:, 2:6].T.ravel())
+	values = values.reshape(len(PROBES), len(normal))
+	ok &= np.all(good.reshape(len(PROBES), len(normal)), axis=0)
+
+	for i, probe in enumerate(PROBES):
+		chunk[probe] = values[i]
+
+	#the health, after the readings of the rows written with it
+	health = np.flatnonzero(count[normal] == 7)
+	values, good = numbers(raw, fields[health, 5] + 1, semicolons[firsts[normal][health] + 6])
+	ok[health] &= good & (values == np.floor(values))
+	chunk["HEALTH"][health] = values
+
+	chunk = dict((key, chunk[key][ok]) for key in chunk)
+	chunk["line"] = normal[ok] + first
+
+	#all the other rows are read one by one
+	rest = np.ones(len(ends), dtype=bool)
+	rest[normal[ok]] = False
+	rest = np.flatnonzero(rest)
+
+	if len(rest) == 0:
+		return chunk
+
+	parts = [chunk, slow(data, starts, ends, rest, first, extra, names)]
+	result = dict((key, np.concatenate([part[key] for part in parts])) for key in chunk)
+
+	#back in the order of the file
+	order = np.argsort(result["line"], kind="stable")
+
+	return dict((key, result[key][order]) for key in result)
+
+
+def digits(raw, starts, size, form):
+	"""
+	@Name : digits()
+	@Brief : read a fixed size field made of 2 or 4 digits numbers (ex : "DD/MM/YYYY")
+	@Input arg : (array) raw : the bytes of the chunk
+				 (array) starts : the start of the field in every row
+				 (int) size : the size of the field
+				 (tuple) form : the position of the digits and of the separators
+	@Return : (list, array) the numbers (one array per number) and the mask of the valid fields
+	"""
+
+	#one line per position in the field, so every step below use contiguous memory
+	chars = raw[starts + np.arange(size)[:, None]] - np.uint8(48)
+
+	digit, separator = form
+	ok = np.all(chars[digit] <= 9, axis=0)
+	#":" is 10 after the "0" and "/" is 255
+	ok &= np.all((chars[separator] == 10) | (chars[separator] == 255), axis=0)
+
+	#the numbers are between the separators
+	values = []
+	start = 0
+	for end in separator + [size]:
+		value = np.zeros(len(starts), dtype=np.int32)
+		for i in range(start, end):
+			value = value * 10 + chars[i]
+		values.append(value)
+		start = end + 1
+
+	return values, ok
+
+
+def numbers(raw, starts, ends, width=WIDTH):
+	"""
+	@Name : numbers()
+	@Brief : read a decimal number field of every row ("-12.345"), the number is read as a
+			 integer divided by a power of 10, so the result is the same as float()
+	@Input arg : (array) raw : the bytes of the chunk, followed by at least "width" zeros
+				 (array) starts : the start of the field in every row
+				 (array) ends : the end of the field (the position of the ";")
+				 (int) width : the longest field read
+	@Return : (array, array) the numbers and the mask of the valid fields
+	"""
+
+	lengths = ends - starts
+	size = int(min(width, lengths.max())) if len(lengths) != 0 else 0
+
+	#one line per position in the field, so every step below use contiguous memory
+	position = np.arange(size)[:, None]
+	inside = position < lengths
+	chars = raw[starts + position]
+
+	digit = inside & ((chars - np.uint8(48)) < 10)
+	dot = inside & (chars == 46)
+	minus = inside[:1] & (chars[:1] == 45)
+
+	#only digits and a single dot, with a "-" before them
+	other = inside & ~digit & ~dot
+	other[:1] &= ~minus
+
+	ok = (lengths > 0) & (lengths <= width) & ~np.any(other, axis=0)
+	ok &= (np.sum(dot, axis=0) <= 1) & np.any(digit, axis=0)
+
+	mantissa = np.zeros(len(starts), dtype=np.int64)
+	decimals = np.zeros(len(starts), dtype=np.int64)
+	after = np.zeros(len(starts), dtype=bool)
+
+	for i in range(size):
+		value = chars[i].astype(np.int64) - 48
+		mantissa = np.where(digit[i], mantissa * 10 + value, mantissa)
+		after |= dot[i]
+		decimals += digit[i] & after
+
+	values = mantissa / 10.0 ** decimals
+
+	return np.where(minus[0] if size != 0 else False, -values, values), ok
+
+
+def stamp(year, month, day, hour, minute, second):
+	"""
+	@Name : stamp()
+	@Brief : convert the fields of the time to datetime64, a field out of range give NaT
+	@Input arg : (array) year, month, day, hour, minute, second : the fields, as floats
+	@Return : (array, array) the times and the mask of the bad ones
+	"""
+
+	bad = ((year < 1970) | (year > 2200) | (month < 1) | (month > 12) | (day < 1) | (day > 31) |
+		   (hour > 23) | (minute > 59) | (second > 59) | (hour < 0) | (minute < 0) | (second < 0))
+	bad |= (year != np.floor(year)) | (month != np.floor(month)) | (day != np.floor(day))
+
+	year = np.where(bad, 1970, year).astype(np.int64)
+	month = np.where(bad, 1, month).astype(np.int64)
+	day = np.where(bad, 1, day).astype(np.int64)
+
+	months = (year - 1970) * 12 + (month - 1)
+	days = months.astype("datetime64[M]").astype("datetime64[D]") + (day - 1)
+
+	#a day past the end of its month (ex : 31/04)
+	bad |= days.astype("datetime64[M]") != months.astype("datetime64[M]")
+
+	seconds = (hour * 3600 + minute * 60 + second).astype(np.int64)
+	times = days.astype("datetime64[s]") + seconds
+	times[bad] = np.datetime64("NaT")
+
+	return times, bad
+
+
+def slow(data, starts, ends, lines, first, extra, names=()):
+	"""
+	@Name : slow()
+	@Brief : read the rows without the normal format one at a time, the blank lines and
+			 the header are dropped
+	@Input arg : (bytes) data : the lines of the chunk
+				 (array) starts : the start of every line
+				 (array) ends : the end of every line
+				 (array) lines : the lines to read
+				 (int) first : the number of the first line in the file
+				 (int) extra : the number of extra fields kept per row
+				 (list) names : the columns of the header after HEALTH
+	@Return : (dict) the arrays of the rows
+	"""
+
+	rows = []
+
+	for index in lines:
+		text = data[starts[index]:ends[index]].decode("ascii", "replace").strip()
+		fields = [field.strip() for field in text.split(";")]
+
+		#the ";" after the last field
+		if len(fields) != 0 and fields[-1] == "":
+			fields.pop()
+
+		if len(fields) == 0 or fields[0].upper() == "TIME":
+			continue
+
+		rows.append((index, fields))
+
+	chunk = empty(len(rows), extra, names)
+
+	#year, month, day, hour, minute, second of every row, converted all at once
+	moments = np.zeros((len(rows), 6))
+
+	for row, (index, fields) in enumerate(rows):
+		reason = 0
+		chunk["line"][row] = index + first
+
+		moment = clock(fields[0], fields[1] if len(fields) > 1 else "")
+		if moment is None:
+			reason |= REASON_TIME
+		else:
+			moments[row] = moment
+
+		readings = fields[2:]
+
+		#the health after the readings, a whole number, the readings of the other probes
+		#of the registry and the statistics are after it (see sensors.py)
+		header = False
+		if len(readings) > len(PROBES) and readings[len(PROBES)].isdigit():
+			chunk["HEALTH"][row] = int(readings.pop(len(PROBES)))
+			#the columns of the header, else in the "extra" column
+			header = len(names) != 0 and len(readings) == len(PROBES) + len(names)
+
+		if len(readings) < len(PROBES):
+			reason |= REASON_TRUNCATED
+		elif len(readings) > len(PROBES) and not header:
+			reason |= REASON_EXTRA
+
+		for i, field in enumerate(readings):
+			#the statistics of a probe without reading are empty
+			if header and i >= len(PROBES) and field == "":
+				continue
+
+			try:
+				#the EZO circuits can give more than one value (ex : "152.3,14.16")
+				value = float(field.split(",")[0])
+			except ValueError:
+				value = np.nan
+				reason |= REASON_NUMBER
+
+			if i < len(PROBES):
+				chunk[PROBES[i]][row] = value
+			elif header:
+				chunk[names[i - len(PROBES)]][row] = value
+			elif i - len(PROBES) < extra:
+				chunk["extra"][row, i - len(PROBES)] = value
+
+		chunk["reason"][row] = reason
+
+	times, bad = stamp(*moments.T)
+	chunk["time"] = times
+	chunk["reason"][bad] |= REASON_TIME
+
+	return chunk
+
+
+def clock(time, date):
+	"""
+	@Name : clock()
+	@Brief : read the time and date fields of a row ("HH:MM" or "HH:MM:SS", "DD/MM/YYYY")
+	@Input arg : (string) time : the time field
+				 (string) date : the date field
+	@Return : [year, month, day, hour, minute, second], None if not valid
+	"""
+
+	try:
+		hms = [int(x) for x in time.split(":")]
+		dmy = [int(x) for x in date.split("/")]
+	except ValueError:
+		return None
+
+	if len(hms) not in [2, 3] or len(dmy) != 3:
+		return None
+
+	return [dmy[2], dmy[1], dmy[0]] + hms + [0] * (3 - len(hms))
@@ -0,0 +1,132 @@
+"""@package docstring
+File name : metrics.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Timing of every stage of the acquisition cycle (boot, wake, warm-up, compensation,
+	   reading, sleep, data write), every stage is saved with the address of the probe
+	   and the cycle in metrics.csv next to data.csv. When disabled in config.ini the
+	   timing cost a single test per stage. The numbers of the cycle (readings of the
+	   warm-up, next wake up) are saved even without the timing, "counts = no" turn
+	   them off.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+
+
+class Metrics(object):
+
+	def __init__(self, config_file=None):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the timing is enabled by "enable = yes" in the
+				 [METRICS] section of config.ini, the numbers by "counts = yes" (the default)
+		@Input arg : (ConfigParser) config_file : the loaded config.ini, None to disable the timing
+		@Return : n/a
+		"""
+
+		self.enabled = False
+		self.counting = False
+		self.path = None
+
+		if config_file is not None:
+			self.enabled = config_file.getboolean("METRICS", "enable", fallback=False)
+			self.counting = config_file.getboolean("METRICS", "counts", fallback=True)
+			self.path = os.path.join(os.path.dirname(config_file.get("PATH", "local")), "metrics.csv")
+
+		#id of the cycle (time of its start) and the stages timed but not saved yet
+		self.cycle = 0
+		self.origin = 0.0
+		self.lines = []
+
+	def begin(self):
+		"""
+		@Name : begin()
+		@Brief : start a new cycle, the stages after it are tagged with its id
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if not self.enabled and not self.counting:
+			return
+
+		self.origin = time.time()
+		self.cycle = int(self.origin)
+
+	def start(self):
+		"""
+		@Name : start()
+		@Brief : start the timing of a stage
+		@Input arg : n/a
+		@Return : the mark to give to stop(), None when disabled
+		"""
+
+		if not self.enabled:
+			return None
+
+		return time.time()
+
+	def stop(self, stage, address, mark):
+		"""
+		@Name : stop()
+		@Brief : end the timing of a stage
+		@Input arg : (string) stage : the name of the stage (boot, wake, warmup...)
+					 (int) address : the address of the probe, None for the stages of the cycle
+					 (float) mark : the mark given by start()
+		@Return : n/a
+		"""
+
+		if mark is None:
+			return
+
+		now = time.time()
+		adr = "" if address is None else str(address)
+
+		#cycle;stage;address;start from the cycle (s);duration (s)
+		self.lines.append(str(self.cycle) + ";" + stage + ";" + adr + ";" + ("%.3f" % (mark - self.origin)) + ";" + ("%.3f" % (now - mark)) + "\n")
+
+	def count(self, stage, address, value):
+		"""
+		@Name : count()
+		@Brief : save a number of the cycle instead of a duration (ex: the readings of the
+				 warm-up), the last field of the line is the number, saved even without the
+				 timing of the stages
+		@Input arg : (string) stage : the name of the number (warmup_reads...)
+					 (int) address : the address of the probe, None for the numbers of the cycle
+					 (int) value : the number
+		@Return : n/a
+		"""
+
+		if not self.counting:
+			return
+
+		adr = "" if address is None else str(address)
+
+		self.lines.append(str(self.cycle) + ";" + stage + ";" + adr + ";" + ("%.3f" % (time.time() - self.origin)) + ";" + str(value) + "\n")
+
+	def flush(self):
+		"""
+		@Name : flush()
+		@Brief : save the stages timed in metrics.csv with a single append
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if len(self.lines) == 0:
+			return
+
+		try:
+			new = not os.path.exists(self.path)
+			metricsFile = open(self.path, "a")
+			if new:
+				metricsFile.write("CYCLE;STAGE;ADDRESS;START;DURATION\n")
+			metricsFile.write("".join(self.lines))
+			metricsFile.close()
+		except (IOError, OSError):
+			pass
+
+		self.lines = []
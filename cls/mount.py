@@ -0,0 +1,162 @@
+"""@package docstring
+File name : mount.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Cache of the mounted partitions used by control.py to know if the USB key is there,
+	   the mount table is read from /proc/self/mountinfo only when the kernel tell us it
+	   changed or when the cache is too old, so a data write is a lookup in memory.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+import select
+
+
+#___MOUNT_TABLE___
+
+#file of the kernel listing all the mount points of our process
+MOUNTINFO = "/proc/self/mountinfo"
+
+#longest time the cache is used without reading the mount table again (in seconds)
+MOUNT_TTL = 5.0
+
+
+class MountCache(object):
+
+	def __init__(self, ttl=MOUNT_TTL):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor
+		@Input arg : (float) ttl : longest time the cache is used without reading the mount table
+		@Return : n/a
+		"""
+
+		self.ttl = ttl
+		self.mounts = []
+		self.stamp = None
+
+		"""
+		The kernel flag the mount table with POLLPRI when a partition is
+		mounted or unmounted, we keep it open to be told about the change
+		"""
+		self.notice = None
+		self.poller = None
+
+		try:
+			self.notice = open(MOUNTINFO, "r")
+			self.poller = select.poll()
+			self.poller.register(self.notice, select.POLLPRI | select.POLLERR)
+		except (IOError, OSError, AttributeError):
+			self.notice = None
+			self.poller = None
+
+	def refresh(self):
+		"""
+		@Name : refresh()
+		@Brief : read the mount table again
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		mounts = []
+
+		try:
+			if self.notice is not None:
+				#reading the file to the end acknowledge the change notice
+				self.notice.seek(0)
+				lines = self.notice.read().splitlines()
+			else:
+				with open(MOUNTINFO, "r") as file:
+					lines = file.read().splitlines()
+		except (IOError, OSError):
+			lines = []
+
+		for line in lines:
+			fields = line.split(" ")
+
+			#the fifth field is the mount point, with the space and special char escaped in octal
+			if len(fields) > 4:
+				mounts.append(self.unescape(fields[4]))
+
+		#longest mount point first, the first one matching a path is the one holding it
+		mounts.sort(key=len, reverse=True)
+
+		self.mounts = mounts
+		self.stamp = time.time()
+
+	def invalidate(self):
+		"""
+		@Name : invalidate()
+		@Brief : force the next lookup to read the mount table again (ex: a write failed on the key)
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		self.stamp = None
+
+	def changed(self):
+		"""
+		@Name : changed()
+		@Brief : tell if the cache need to be refreshed, because it's too old or the kernel
+				 told us a partition was mounted or unmounted
+		@Input arg : n/a
+		@Return : true or false
+		"""
+
+		if self.stamp is None or time.time() - self.stamp > self.ttl:
+			return True
+
+		if self.poller is not None and len(self.poller.poll(0)) != 0:
+			return True
+
+		return False
+
+	def resolve(self, path):
+		"""
+		@Name : resolve()
+		@Brief : find the mount point holding a path
+		@Input arg : (string) path : the file or folder
+		@Return : the mount point of the path, "/" if no other partition hold it
+		"""
+
+		if self.changed():
+			self.refresh()
+
+		path = os.path.abspath(path)
+
+		for mount in self.mounts:
+			if mount == "/":
+				continue
+			if path == mount or path.startswith(mount.rstrip("/") + "/"):
+				return mount
+
+		return "/"
+
+	def unescape(self, field):
+		"""
+		@Name : unescape()
+		@Brief : convert the octal escaped char of the mount table (ex: "\\040" for a space)
+		@Input arg : (string) field : the escaped mount point
+		@Return : the mount point
+		"""
+
+		if field.find("\\") == -1:
+			return field
+
+		output = ""
+		i = 0
+
+		while i < len(field):
+			#a "\" followed by 3 octal digits
+			if field[i] == "\\" and i + 4 <= len(field) and all(c in "01234567" for c in field[i + 1:i + 4]):
+				output += chr(int(field[i + 1:i + 4], 8))
+				i += 4
+			else:
+				output += field[i]
+				i += 1
+
+		return output
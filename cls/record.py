@@ -0,0 +1,218 @@
+"""@package docstring
+File name : record.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Record writer used by main.py, the fields of a measurement row are kept in memory
+	   and the whole row is saved with a single append, a cycle that die partway leave
+	   no half row in the data file. Many rows can be batched in the same append.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+from cls.binlog import PROBES, STATUS_MISSING, STATUS_HEALTH
+from cls.timeindex import TimeIndex
+from cls.sensors import Registry
+from cls.aggregate import AggregateStore
+
+
+class RecordWriter(object):
+
+	def __init__(self, machine, config_file, batch=None):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the [RECORD] section of config.ini give the number of
+				 rows saved together (batch) and if the data is forced on the storage (fsync),
+				 the [STORAGE] section choose between data.csv (csv) and the binary log (binary)
+		@Input arg : (Control) machine : object used to save the data
+					 (ConfigParser) config_file : the loaded config.ini
+					 (int) batch : number of rows saved together, replace the one of config.ini
+		@Return : n/a
+		"""
+
+		self.machine = machine
+		self.batch = batch if batch is not None else config_file.getint("RECORD", "batch", fallback=1)
+		self.sync = config_file.getboolean("RECORD", "fsync", fallback=True)
+		self.binary = config_file.get("STORAGE", "backend", fallback="csv").lower() == "binary"
+		self.station = config_file.getint("STORAGE", "station", fallback=0)
+
+		#fields of the row being built and its time in seconds since 1970
+		self.fields = []
+		self.epoch = 0.0
+		#rows done but not saved yet, and their time
+		self.rows = []
+		self.times = []
+		#time index of every data file written, {path : TimeIndex}
+		self.indexes = {}
+
+		#hourly and daily summary of the readings next to the data file, the [SUMMARY]
+		#section of config.ini can turn it off (see aggregate.py)
+		self.sensors = Registry(config_file)
+		self.summary = None
+		self.values = []
+		if config_file.getboolean("SUMMARY", "enable", fallback=True):
+			self.summary = AggregateStore(os.path.dirname(config_file.get("PATH", "local")))
+
+	def add(self, field):
+		"""
+		@Name : add()
+		@Brief : add a field at the end of the row being built
+		@Input arg : (string) field : the value of the field (a reading, the time...)
+		@Return : n/a
+		"""
+
+		self.fields.append(str(field).replace(";", ",").replace("\n", ""))
+
+	def stamp(self, date, seconds=False):
+		"""
+		@Name : stamp()
+		@Brief : add the time and date fields at the start of the row, in the data.csv format
+		@Input arg : (struct_time) date : the time of the measurement
+					 (bool) seconds : if True the time field is HH:MM:SS (stream mode), else HH:MM
+		@Return : n/a
+		"""
+
+		self.epoch = time.mktime(date)
+		self.fields.append(time.strftime("%H:%M:%S" if seconds else "%H:%M", date))
+		self.fields.append(time.strftime("%d/%m/%Y", date))
+
+	def commit(self):
+		"""
+		@Name : commit()
+		@Brief : close the row being built, the rows are saved when the batch is full
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.binary:
+			#a record of the binary log, the time and date fields are replaced by the epoch
+			readings = []
+			status = 0
+
+			for i, field in enumerate(self.fields[2:2 + PROBES]):
+				readings.append(number(field))
+				if readings[-1] != readings[-1]:
+					status |= STATUS_MISSING << i
+
+			#the health of the probes, after the readings, the other probes of the row (after
+			#the health, see sensors.py) are not in the binary log so only their flags are dropped
+			if len(self.fields) > 2 + PROBES:
+				health = number(self.fields[2 + PROBES])
+				count = len(self.sensors.columns())
+				if health == health:
+					for k in range(0, 3):
+						for i in range(0, PROBES):
+							if int(health) & (1 << (k * count + i)):
+								status |= 1 << (STATUS_HEALTH + k * PROBES + i)
+
+			self.rows.append((self.epoch, self.station, readings, status))
+		else:
+			#the data.csv format, a new line before every row and a ";" after every field
+			self.rows.append("\n" + ";".join(self.fields) + ";")
+
+		self.times.append(self.epoch)
+		if self.summary is not None:
+			self.values.append(dict((name, number(field)) for name, field in self.sensors.readings(self.fields[2:]).items()))
+		self.fields = []
+
+		if len(self.rows) >= self.batch:
+			self.flush()
+
+	def flush(self):
+		"""
+		@Name : flush()
+		@Brief : save all the rows done with a single append
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if len(self.rows) == 0:
+			return
+
+		if self.binary:
+			self.machine.writeBinary(self.rows, self.sync)
+			self.aggregate()
+		else:
+			written = self.machine.writeData("".join(self.rows), self.sync)
+			if written is not None:
+				self.index(written[0], written[1])
+				self.aggregate()
+
+		self.rows = []
+		self.times = []
+		self.values = []
+
+	def index(self, path, offset):
+		"""
+		@Name : index()
+		@Brief : add the rows just saved to the time index of the data file (see timeindex.py)
+		@Input arg : (string) path : the data file the rows were saved in
+					 (int) offset : the byte offset of the first row in the file
+		@Return : n/a
+		"""
+
+		if path not in self.indexes:
+			self.indexes[path] = TimeIndex(path)
+
+		entries = []
+
+		for row, epoch in zip(self.rows, self.times):
+			#the row start after its new line
+			entries.append((epoch, offset + 1))
+			offset += len(row)
+
+		try:
+			self.indexes[path].addMany(entries)
+		except (IOError, OSError) as e:
+			#the index can be made again from the data file, the rows are not lost
+			self.machine.log(str(e), None, path + ".idx", getattr(e, "errno", None))
+
+	def aggregate(self):
+		"""
+		@Name : aggregate()
+		@Brief : add the rows just saved to the hourly and daily summary (see aggregate.py),
+				 the summary is saved with the rows so it is never late on the data file
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.summary is None:
+			return
+
+		for epoch, values in zip(self.times, self.values):
+			self.summary.add(epoch, values)
+
+		try:
+			self.summary.save()
+		except (IOError, OSError) as e:
+			#the periods not saved are saved with the next rows
+			self.machine.log(str(e), None, self.summary.state, getattr(e, "errno", None))
+
+	def close(self):
+		"""
+		@Name : close()
+		@Brief : save the rows left, a row not commited is dropped
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		self.flush()
+		self.fields = []
+
+
+def number(field):
+	"""
+	@Name : number()
+	@Brief : convert a reading to a float, only the first value is kept when the EZO circuit
+			 give more than one (ex : "152.3,14.16")
+	@Input arg : (string) field : the reading
+	@Return : the reading as a float, NaN if it's not a number
+	"""
+
+	try:
+		return float(field.split(",")[0])
+	except ValueError:
+		return float("nan")
@@ -0,0 +1,303 @@
+"""@package docstring
+File name : segment.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Segments of the data file and of the error log, the file written is closed every
+	   day (or hour, see the [SEGMENT] section of config.ini) or when it is too big and
+	   moved in the "segments" folder next to it. A closed segment is compressed (gzip)
+	   by a background thread and a line is added in segments/manifest.csv with its
+	   time span, number of rows and checksum, so the tools copying the data only take
+	   the new segments.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+import zlib
+import gzip
+
+
+#___SEGMENT_CONFIG___
+
+#folder of the segments, next to the file written
+FOLDER = "segments"
+
+#the list of the compressed segments, in the segments folder
+MANIFEST = "manifest.csv"
+HEADER = "NAME; START; END; ROWS; BYTES; CRC32; \n"
+
+#the period of a segment, format of the time giving the same string for the whole period
+PERIODS = {"none" : None, "hour" : "%Y%m%d%H", "day" : "%Y%m%d"}
+
+#default values when missing from the [SEGMENT] section of config.ini
+PERIOD = "day"
+MAX_SIZE = 4194304		#size of the data file before it is closed (in bytes), 0 for no limit
+
+#size of the blocks copied to the usb key (in bytes)
+BLOCK = 65536
+
+
+def openSegments(config_file, path, parse, max_size=None):
+	"""
+	@Name : openSegments()
+	@Brief : make the segments of a file if turned on in the [SEGMENT] section of config.ini
+	@Input arg : (ConfigParser) config_file : the loaded config.ini
+				 (string) path : the file written (data.csv, errorlog.txt)
+				 (function) parse : give the time of a line of the file, None for a line without
+				 (int) max_size : the size of the file before it is closed, replace the one of config.ini
+	@Return : (Segments) the segments, None if the file is not cut
+	"""
+
+	if not config_file.getboolean("SEGMENT", "enable", fallback=False):
+		return None
+
+	period = config_file.get("SEGMENT", "period", fallback=PERIOD).lower()
+
+	if max_size is None:
+		max_size = config_file.getint("SEGMENT", "max_size", fallback=MAX_SIZE)
+
+	return Segments(path, PERIODS.get(period, PERIODS[PERIOD]), max_size, parse)
+
+
+class Segments(object):
+
+	def __init__(self, path, period, max_size, parse):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor
+		@Input arg : (string) path : the file written
+					 (string) period : format of the time of a period (see PERIODS), None for no period
+					 (int) max_size : the size of the file before it is closed, 0 for no limit
+					 (function) parse : give the time of a line of the file
+		@Return : n/a
+		"""
+
+		self.path = path
+		self.period = period
+		self.max_size = max_size
+		self.parse = parse
+		self.folder = os.path.join(os.path.dirname(path), FOLDER)
+		self.manifest = os.path.join(self.folder, MANIFEST)
+
+		#name of the segments, "data-20261018-071200.csv" for data.csv closed at 07:12:00
+		self.base, self.extension = os.path.splitext(os.path.basename(path))
+
+	def due(self, size):
+		"""
+		@Name : due()
+		@Brief : tell if the file must be closed before more data is written, the last write
+				 was in a other period or the file would be too big. Only the size and the
+				 time of the last change of the file are read, the file is not opened.
+		@Input arg : (int) size : the size of the data to write (in bytes)
+		@Return : true or false
+		"""
+
+		try:
+			stat = os.stat(self.path)
+		except OSError:
+			return False
+
+		if self.max_size > 0 and stat.st_size + size > self.max_size:
+			return True
+
+		if self.period is not None:
+			return time.strftime(self.period, time.localtime(stat.st_mtime)) != time.strftime(self.period, time.localtime())
+
+		return False
+
+	def rotate(self, header=False):
+		"""
+		@Name : rotate()
+		@Brief : close the file, it is moved in the segments folder and a new file is started
+		@Input arg : (bool) header : if True the first line of the file (the header of data.csv)
+							 is written at the start of the new file, a string is written
+							 instead (a new header)
+		@Return : (string) the path of the segment
+		"""
+
+		if not os.path.isdir(self.folder):
+			os.makedirs(self.folder)
+
+		name = self.base + "-" + time.strftime("%Y%m%d-%H%M%S") + self.extension
+		target = os.path.join(self.folder, name)
+
+		#two segments closed in the same second
+		count = 1
+		while os.path.exists(target) or os.path.exists(target + ".gz"):
+			target = os.path.join(self.folder, self.base + "-" + time.strftime("%Y%m%d-%H%M%S") + "-" + str(count) + self.extension)
+			count += 1
+
+		first = b""
+		if isinstance(header, str):
+			first = header.encode("ascii")
+		elif header:
+			with open(self.path, "rb") as oldFile:
+				first = oldFile.readline()
+			if not first.startswith(b"TIME"):
+				first = b""
+
+		os.rename(self.path, target)
+
+		if len(first) != 0:
+			with open(self.path, "wb") as newFile:
+				newFile.write(first)
+
+		return target
+
+	def pending(self):
+		"""
+		@Name : pending()
+		@Brief : the segments closed and not compressed yet
+		@Input arg : n/a
+		@Return : (list) the paths, the oldest first
+		"""
+
+		if not os.path.isdir(self.folder):
+			return []
+
+		prefix = self.base + "-"
+
+		return [os.path.join(self.folder, name) for name in sorted(os.listdir(self.folder)) if name.startswith(prefix) and name.endswith(self.extension)]
+
+	def compress(self):
+		"""
+		@Name : compress()
+		@Brief : compress the segments closed and add them in the manifest, a segment cut by
+				 a power loss during the compression is done again from the start
+		@Input arg : n/a
+		@Return : (int) the number of segments compressed
+		"""
+
+		done = 0
+
+		for source in self.pending():
+			self.compressOne(source)
+			done += 1
+
+		return done
+
+	def compressOne(self, source):
+		"""
+		@Name : compressOne()
+		@Brief : compress a segment, the manifest line is saved before the compressed file is
+				 renamed and the segment removed last, so a segment is never lost
+		@Input arg : (string) source : the path of the segment
+		@Return : n/a
+		"""
+
+		name = os.path.basename(source) + ".gz"
+		temp = os.path.join(self.folder, name + ".tmp")
+
+		rows = 0
+		size = 0
+		crc = 0
+		start = None
+		end = None
+
+		with open(source, "rb") as sourceFile, open(temp, "wb") as rawFile:
+			target = gzip.GzipFile(os.path.basename(source), "wb", 9, rawFile)
+
+			for line in sourceFile:
+				target.write(line)
+				size += len(line)
+				crc = zlib.crc32(line, crc)
+
+				epoch = self.parse(line.decode("ascii", "replace"))
+				if epoch is not None:
+					rows += 1
+					start = epoch if start is None else start
+					end = epoch
+
+			target.close()
+			rawFile.flush()
+			os.fsync(rawFile.fileno())
+
+		if name not in self.names():
+			new = not os.path.exists(self.manifest)
+			with open(self.manifest, "a") as manifestFile:
+				manifestFile.write((HEADER if new else "") + "%s;%s;%s;%d;%d;%08x;\n" % (name, stamp(start), stamp(end), rows, size, crc & 0xFFFFFFFF))
+				manifestFile.flush()
+				os.fsync(manifestFile.fileno())
+
+		os.replace(temp, os.path.join(self.folder, name))
+		os.remove(source)
+
+	def names(self):
+		"""
+		@Name : names()
+		@Brief : the segments of the manifest
+		@Input arg : n/a
+		@Return : (list) the names of the compressed segments, the oldest first
+		"""
+
+		if not os.path.exists(self.manifest):
+			return []
+
+		with open(self.manifest, "r") as manifestFile:
+			return [line.split(";")[0] for line in manifestFile if line.strip() != "" and not line.startswith("NAME")]
+
+	def copy(self, folder):
+		"""
+		@Name : copy()
+		@Brief : copy the compressed segments not copied yet and the manifest to a other
+				 folder (the usb key), the segments are never changed so only the new ones are copied
+		@Input arg : (string) folder : the segments folder on the key
+		@Return : n/a
+		"""
+
+		names = self.names()
+
+		if len(names) == 0:
+			return
+
+		if not os.path.isdir(folder):
+			os.makedirs(folder)
+
+		for name in names:
+			source = os.path.join(self.folder, name)
+			if os.path.exists(source) and not os.path.exists(os.path.join(folder, name)):
+				copyFile(source, os.path.join(folder, name))
+
+		#the manifest last, every segment it give is on the key
+		copyFile(self.manifest, os.path.join(folder, MANIFEST))
+
+
+def copyFile(source, target):
+	"""
+	@Name : copyFile()
+	@Brief : copy a file, the target is replaced in a single step once complete
+	@Input arg : (string) source : the path of the file
+				 (string) target : the path of the copy
+	@Return : n/a
+	"""
+
+	temp = target + ".tmp"
+
+	with open(source, "rb") as sourceFile, open(temp, "wb") as targetFile:
+		while True:
+			block = sourceFile.read(BLOCK)
+			if len(block) == 0:
+				break
+			targetFile.write(block)
+
+		targetFile.flush()
+		os.fsync(targetFile.fileno())
+
+	os.replace(temp, target)
+
+
+def stamp(epoch):
+	"""
+	@Name : stamp()
+	@Brief : the time of the manifest
+	@Input arg : (float) epoch : the time in seconds since 1970, None if not known
+	@Return : (string) "DD/MM/YYYY-HH:MM:SS", empty if not known
+	"""
+
+	if epoch is None:
+		return ""
+
+	return time.strftime("%d/%m/%Y-%H:%M:%S", time.localtime(epoch))
@@ -0,0 +1,302 @@
+"""@package docstring
+File name : sensors.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Registry of the EZO circuits of a bus, every probe of the [ADDRESS] section is a
+	   sensor with its type, warm-up, command delays and compensation inputs (ex: the DO
+	   need the temperature and the salinity). The type give the default values, a
+	   [SENSOR:name] section change them. The inputs make a dependency graph, the
+	   acquisition engine start the probes giving a input first and every probe go on
+	   as soon as its inputs are read, so a probe without input (ORP) or a second DO
+	   probe don't make the cycle longer.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+
+#___SENSOR_TYPES___
+
+"""
+Default of every EZO circuit type,
+warmup : (minimum readings, maximum readings, tolerance between two successive readings)
+read : longest time to compute a reading (in seconds)
+compensation : longest time to compute a compensation command (in seconds)
+sleep : longest time to wake up (in seconds)
+inputs : compensation needed, (command, type of the probe giving the value)
+"""
+TYPES = {"RTD" : {"warmup" : (3, 16, 0.05), "read" : 0.9, "compensation" : 0.3, "sleep" : 0.9, "inputs" : []},
+		 "EC" : {"warmup" : (3, 16, 1.0), "read" : 0.9, "compensation" : 0.3, "sleep" : 0.9, "inputs" : [("T", "RTD")]},
+		 "PH" : {"warmup" : (3, 16, 0.02), "read" : 0.9, "compensation" : 0.3, "sleep" : 0.9, "inputs" : [("T", "RTD")]},
+		 "DO" : {"warmup" : (3, 16, 0.05), "read" : 0.9, "compensation" : 0.3, "sleep" : 0.9, "inputs" : [("T", "RTD"), ("S", "EC")]},
+		 "ORP" : {"warmup" : (3, 16, 1.0), "read" : 0.9, "compensation" : 0.3, "sleep" : 0.9, "inputs" : []}}
+
+#type of a probe not known, read without warm-up tolerance and without compensation
+UNKNOWN = {"warmup" : (16, 16, 0.0), "read" : 0.9, "compensation" : 0.3, "sleep" : 0.9, "inputs" : []}
+
+#type of the probes from their name in [ADDRESS] without the number at the end (DO2 is a
+#DO), when not given in [SENSOR:name]
+KINDS = {"TEMP" : "RTD", "CON" : "EC", "PH" : "PH", "DO" : "DO", "ORP" : "ORP"}
+
+#the columns of data.csv always there (empty when the probe is missing), the other probes
+#are written after the HEALTH column
+STANDARD = ["TEMP", "CON", "PH", "DO"]
+
+#prefix of the sections of the sensors in config.ini
+SECTION = "SENSOR:"
+
+
+class Sensor(object):
+
+	def __init__(self, name, kind, address):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the values of the type are used
+		@Input arg : (string) name : the name of the probe in [ADDRESS] (ex: DO2)
+					 (string) kind : the type of EZO circuit (RTD, EC, PH, DO, ORP)
+					 (int) address : the address of the EZO circuit
+		@Return : n/a
+		"""
+
+		default = TYPES.get(kind, UNKNOWN)
+
+		self.name = name
+		self.kind = kind
+		self.address = address
+		self.warmup = default["warmup"]
+		self.read = default["read"]
+		self.compensation = default["compensation"]
+		self.sleep = default["sleep"]
+		#(command, name of the sensor giving the value)
+		self.inputs = []
+		#number of sensors before this one in the dependency graph
+		self.depth = 0
+
+
+class Registry(object):
+
+	def __init__(self, config_file):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, make the sensors of the [ADDRESS] section and the
+				 dependency graph of their inputs
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+		@Return : n/a
+		"""
+
+		#the problems of the config, saved in the error log by the acquisition engine
+		self.errors = []
+
+		#"stats" : the reading is the median of the stable readings of the warm-up and the
+		#mean, standard deviation and count are saved after the other probes
+		self.stats = config_file.get("SAMPLING", "mode", fallback="single").lower() == "stats"
+
+		names = [key.upper() for key in config_file.options("ADDRESS")] if config_file.has_section("ADDRESS") else []
+		names = [name for name in STANDARD if name in names] + [name for name in names if name not in STANDARD]
+
+		self.sensors = []
+
+		for name in names:
+			section = self.section(config_file, name)
+			kind = KINDS.get(name.rstrip("0123456789"), name)
+			if section:
+				kind = config_file.get(section, "type", fallback=kind).upper()
+			sensor = Sensor(name, kind, config_file.getint("ADDRESS", name))
+
+			#the [WARMUP] section of the first version, then the [SENSOR:name] section
+			minimum, maximum, tolerance = sensor.warmup
+			for other in ["WARMUP", section]:
+				if other and config_file.has_section(other):
+					prefix = name.lower() + "_" if other == "WARMUP" else "warmup_"
+					minimum = config_file.getint(other, prefix + "min", fallback=minimum)
+					maximum = config_file.getint(other, prefix + "max", fallback=maximum)
+					tolerance = config_file.getfloat(other, prefix + "tolerance", fallback=tolerance)
+			sensor.warmup = (minimum, maximum, tolerance)
+
+			if section:
+				sensor.read = config_file.getfloat(section, "read", fallback=sensor.read)
+				sensor.compensation = config_file.getfloat(section, "compensation", fallback=sensor.compensation)
+				sensor.sleep = config_file.getfloat(section, "sleep", fallback=sensor.sleep)
+
+			self.sensors.append(sensor)
+
+		self.names = dict((sensor.name, sensor) for sensor in self.sensors)
+		self.addresses = dict((sensor.address, sensor) for sensor in self.sensors)
+
+		for sensor in self.sensors:
+			sensor.inputs = self.inputs(config_file, sensor)
+
+		self.graph()
+
+	def section(self, config_file, name):
+		"""
+		@Name : section()
+		@Brief : find the [SENSOR:name] section of a sensor, the case of the name is not used
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+					 (string) name : the name of the sensor
+		@Return : (string) the section, None if there is none
+		"""
+
+		for section in config_file.sections():
+			if section.upper() == SECTION + name:
+				return section
+
+		return None
+
+	def inputs(self, config_file, sensor):
+		"""
+		@Name : inputs()
+		@Brief : find the sensors giving the compensation of a sensor, "inputs" of the
+				 [SENSOR:name] section (ex: "T:TEMP, S:CON2", empty for none) or else the
+				 first sensor of the type needed
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+					 (Sensor) sensor : the sensor
+		@Return : (list) the inputs, (command, name of the sensor giving the value)
+		"""
+
+		section = self.section(config_file, sensor.name)
+		inputs = []
+
+		if section and config_file.has_option(section, "inputs"):
+			for item in config_file.get(section, "inputs").split(","):
+				if item.strip() == "":
+					continue
+				command, x, name = item.partition(":")
+				if name.strip().upper() not in self.names:
+					self.errors.append("SENSOR " + sensor.name + " : NO SENSOR " + name.strip().upper())
+					continue
+				inputs.append((command.strip().upper(), name.strip().upper()))
+			return inputs
+
+		for command, kind in TYPES.get(sensor.kind, UNKNOWN)["inputs"]:
+			for other in self.sensors:
+				if other.kind == kind and other is not sensor:
+					inputs.append((command, other.name))
+					break
+
+		return inputs
+
+	def graph(self):
+		"""
+		@Name : graph()
+		@Brief : give every sensor its depth in the dependency graph of the inputs, a input
+				 making a loop (ex: A need B and B need A) is dropped
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		done = set()
+
+		def visit(sensor, path):
+			if sensor.name in done:
+				return
+
+			path.append(sensor.name)
+			depth = 0
+
+			for command, name in list(sensor.inputs):
+				if name in path:
+					sensor.inputs.remove((command, name))
+					self.errors.append("SENSOR " + sensor.name + " : LOOP WITH " + name + ", " + command + " NOT SENT")
+					continue
+				visit(self.names[name], path)
+				depth = max(depth, self.names[name].depth + 1)
+
+			path.pop()
+			sensor.depth = depth
+			done.add(sensor.name)
+
+		for sensor in self.sensors:
+			visit(sensor, [])
+
+	def get(self, address):
+		"""
+		@Name : get()
+		@Brief : the sensor at a address
+		@Input arg : (int) address : the address of the EZO circuit
+		@Return : (Sensor) the sensor, a sensor of unknown type if the address is not in [ADDRESS]
+		"""
+
+		if address not in self.addresses:
+			return Sensor(str(address), None, address)
+
+		return self.addresses[address]
+
+	def order(self, address):
+		"""
+		@Name : order()
+		@Brief : sort addresses in the order of the dependency graph, the sensors giving a
+				 input are started first
+		@Input arg : (list) address : the addresses
+		@Return : (list) the addresses sorted
+		"""
+
+		return sorted(address, key=lambda adr: self.get(adr).depth)
+
+	def columns(self):
+		"""
+		@Name : columns()
+		@Brief : the address of the sensors in the order of the data row, the standard ones
+				 first (None when missing) then the other ones
+		@Input arg : n/a
+		@Return : (list) the addresses
+		"""
+
+		address = [self.names[name].address if name in self.names else None for name in STANDARD]
+
+		return address + [sensor.address for sensor in self.sensors if sensor.name not in STANDARD]
+
+	def header(self):
+		"""
+		@Name : header()
+		@Brief : the first line of the data file
+		@Input arg : n/a
+		@Return : (string) the line
+		"""
+
+		extra = "".join(sensor.name + "; " for sensor in self.sensors if sensor.name not in STANDARD)
+
+		if self.stats:
+			for adr in self.columns():
+				if adr is not None:
+					name = self.get(adr).name
+					extra += name + "_MEAN; " + name + "_STD; " + name + "_N; "
+
+		return "TIME; DATE; " + "; ".join(STANDARD) + "; HEALTH; " + extra + "\n"
+
+	def row(self, readings, health, stats=None):
+		"""
+		@Name : row()
+		@Brief : the fields of the data row, in the order of columns() with the health after
+				 the standard probes, then the statistics of every probe in the "stats" mode
+		@Input arg : (dict) readings : the reading of every address
+					 (int) health : the health of the probes (see health.py)
+					 (dict) stats : (mean, standard deviation, count) of every address, empty
+							for a probe without reading
+		@Return : (list) the fields
+		"""
+
+		fields = [readings.get(adr, "") for adr in self.columns()]
+		fields = fields[:len(STANDARD)] + [health] + fields[len(STANDARD):]
+
+		if self.stats:
+			for adr in self.columns():
+				if adr is not None:
+					fields += list((stats or {}).get(adr, ("", "", "")))
+
+		return fields
+
+	def readings(self, fields):
+		"""
+		@Name : readings()
+		@Brief : find the reading of every probe in the fields of a data row, the reverse
+				 of row()
+		@Input arg : (list) fields : the fields of the row, without the time and the date
+		@Return : (dict) {name of the probe : reading}, without the probes not in the row
+		"""
+
+		names = STANDARD + [sensor.name for sensor in self.sensors if sensor.name not in STANDARD]
+		fields = fields[:len(STANDARD)] + fields[len(STANDARD) + 1:]
+
+		return dict((name, field) for name, field in zip(names, fields) if name in self.names)
@@ -0,0 +1,255 @@
+"""@package docstring
+File name : station.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : The stations of the controller, one per I2C bus with its own EZO circuits, data
+	   files and station number. The first station is made from the [BUS], [ADDRESS] and
+	   [PATH] sections of config.ini, every [BUS:name] section add one more. A bus can
+	   be a other I2C adapter (/dev/i2c-N) or a channel of a TCA9548A multiplexer, the
+	   stations are measured at the same time by one thread each (see main.py).
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import threading
+import configparser
+from cls.control import Control, openBus
+from cls.acquisition import Acquisition
+from cls.metrics import Metrics
+
+
+#___STATION_CONFIG___
+
+#the options of a [BUS:name] section that are not the address of a probe
+OPTIONS = ["driver", "number", "mux", "channel", "local", "usb", "station"]
+
+#prefix of the sections of the other buses in config.ini
+SECTION = "BUS:"
+
+
+class Station(object):
+
+	def __init__(self, name, config_file, bus, errors=None, metrics=None):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, make the objects used to measure the station
+		@Input arg : (string) name : the name of the station, None for the first one
+					 (ConfigParser) config_file : the config of the station (see derive())
+					 bus : the I2C bus of the station
+					 (ErrorLogger) errors : the error log shared by the stations
+					 (Metrics) metrics : timing of the stages, disabled if not given
+		@Return : n/a
+		"""
+
+		self.name = name
+		self.config_file = config_file
+		self.bus = bus
+		self.machine = Control(config_file, bus, errors)
+		self.machine.name = name
+		self.engine = Acquisition(self.machine, config_file, metrics)
+
+		#the address of every probe in the order of the row, None for a probe not on this bus
+		self.address = self.engine.sensors.columns()
+
+	def probes(self):
+		"""
+		@Name : probes()
+		@Brief : the address of the EZO circuits of the station
+		@Input arg : n/a
+		@Return : (list) the addresses, without the probes missing
+		"""
+
+		return [adr for adr in self.address if adr is not None]
+
+
+class MuxBus(object):
+
+	def __init__(self, adapter, mux, channel):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, a channel of a TCA9548A multiplexer, the channel is
+				 selected before every transfer
+		@Input arg : (Adapter) adapter : the I2C adapter shared by the channels
+					 (int) mux : the address of the multiplexer
+					 (int) channel : the channel (0 to 7)
+		@Return : n/a
+		"""
+
+		self.adapter = adapter
+		self.mux = mux
+		self.channel = channel
+
+	def select(self):
+		"""
+		@Name : select()
+		@Brief : connect the channel to the adapter, the adapter lock must be held
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.adapter.selected != (self.mux, self.channel):
+			self.adapter.selected = None
+			self.adapter.bus.write_byte(self.mux, 1 << self.channel)
+			self.adapter.selected = (self.mux, self.channel)
+
+	def write_i2c_block_data(self, address, cmd, data):
+		"""
+		@Name : write_i2c_block_data()
+		@Brief : same as smbus, on the channel
+		@Input arg : (int) address : the address of the EZO circuit
+					 (int) cmd : the first char of the command
+					 (list) data : the other chars of the command
+		@Return : n/a
+		"""
+
+		with self.adapter.lock:
+			self.select()
+			self.adapter.bus.write_i2c_block_data(address, cmd, data)
+
+	def read_i2c_block_data(self, address, cmd):
+		"""
+		@Name : read_i2c_block_data()
+		@Brief : same as smbus, on the channel
+		@Input arg : (int) address : the address of the EZO circuit
+					 (int) cmd : not used by the EZO circuits
+		@Return : (list) the bytes read
+		"""
+
+		with self.adapter.lock:
+			self.select()
+			return self.adapter.bus.read_i2c_block_data(address, cmd)
+
+
+class Adapter(object):
+
+	def __init__(self, bus):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, a I2C adapter shared by the channels of a multiplexer
+		@Input arg : bus : the I2C bus of the adapter
+		@Return : n/a
+		"""
+
+		self.bus = bus
+		#a single transfer at a time on the adapter, with the channel it need
+		self.lock = threading.Lock()
+		#(multiplexer, channel) connected, None if not known
+		self.selected = None
+
+
+def openStations(config_file, emulate=False, metrics=None):
+	"""
+	@Name : openStations()
+	@Brief : make the stations of config.ini, the first one from the [BUS] section and one
+			 for every [BUS:name] section, they all write in the same error log
+	@Input arg : (ConfigParser) config_file : the loaded config.ini
+				 (bool) emulate : if True the EZO circuits of all the buses are emulated
+				 (Metrics) metrics : timing of the stages of the first station, the other ones
+						 save their timing next to their data file
+	@Return : (list) the stations
+	"""
+
+	#the adapters opened, shared by the channels of a multiplexer, {number : Adapter}
+	adapters = {}
+
+	first = Station(None, config_file, connect(config_file, emulate, adapters), None, metrics)
+	result = [first]
+
+	for section in config_file.sections():
+		if section.upper().startswith(SECTION):
+			derived = derive(config_file, section, len(result))
+			result.append(Station(section[len(SECTION):], derived, connect(derived, emulate, adapters), first.machine.errors, Metrics(derived)))
+
+	return result
+
+
+def configs(config_file):
+	"""
+	@Name : configs()
+	@Brief : the config of every station without opening the buses, for the commands
+			 only reading the data files
+	@Input arg : (ConfigParser) config_file : the loaded config.ini
+	@Return : (list) (name of the station, None for the first one, config of the station)
+	"""
+
+	result = [(None, config_file)]
+
+	for section in config_file.sections():
+		if section.upper().startswith(SECTION):
+			result.append((section[len(SECTION):], derive(config_file, section, len(result))))
+
+	return result
+
+
+def connect(config_file, emulate, adapters):
+	"""
+	@Name : connect()
+	@Brief : open the bus of a station, a channel of a multiplexer ("mux" and "channel" in
+			 the [BUS] section) share its adapter with the other channels
+	@Input arg : (ConfigParser) config_file : the config of the station
+				 (bool) emulate : if True the EZO circuits are emulated
+				 (dict) adapters : the adapters already opened
+	@Return : a object with the smbus.SMBus interface
+	"""
+
+	mux = config_file.getint("BUS", "mux", fallback=None)
+
+	#the emulation have its own EZO circuits for every station, without multiplexer
+	if emulate or mux is None or config_file.get("BUS", "driver", fallback="smbus").lower() == "emulator":
+		return openBus(config_file, emulate)
+
+	number = config_file.getint("BUS", "number", fallback=1)
+
+	if number not in adapters:
+		adapters[number] = Adapter(openBus(config_file))
+
+	return MuxBus(adapters[number], mux, config_file.getint("BUS", "channel"))
+
+
+def derive(config_file, section, index):
+	"""
+	@Name : derive()
+	@Brief : make the config of a other bus, a copy of config.ini where the [BUS], [ADDRESS],
+			 [PATH] and station number are the ones of the [BUS:name] section, every
+			 option not in OPTIONS is the address of a probe (ex: do2 = 98). The data
+			 files are in a folder named after the bus and the station number follow the
+			 one of the first station if not given.
+	@Input arg : (ConfigParser) config_file : the loaded config.ini
+				 (string) section : the section of the bus (ex: BUS:tank)
+				 (int) index : the position of the bus, from 1
+	@Return : (ConfigParser) the config of the bus
+	"""
+
+	name = section[len(SECTION):]
+	derived = configparser.ConfigParser()
+
+	for other in config_file.sections():
+		if not other.upper().startswith(SECTION):
+			derived[other] = dict(config_file.items(other, raw=True))
+
+	options = config_file[section]
+
+	derived["BUS"] = {}
+	for key in ["driver", "number", "mux", "channel"]:
+		if key in options:
+			derived.set("BUS", key, options[key])
+		elif key in ["driver", "number"] and config_file.has_option("BUS", key):
+			derived.set("BUS", key, config_file.get("BUS", key))
+
+	derived["ADDRESS"] = {}
+	for key in config_file.options(section):
+		if key not in OPTIONS:
+			derived.set("ADDRESS", key.upper(), options[key])
+
+	for key in ["local", "usb"]:
+		path = config_file.get("PATH", key)
+		derived.set("PATH", key, options.get(key, os.path.join(os.path.dirname(path), name, os.path.basename(path))))
+
+	if not derived.has_section("STORAGE"):
+		derived["STORAGE"] = {}
+	derived.set("STORAGE", "station", options.get("station", str(config_file.getint("STORAGE", "station", fallback=0) + index)))
+
+	return derived
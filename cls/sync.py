@@ -0,0 +1,394 @@
+"""@package docstring
+File name : sync.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Copy of the local data files to the USB key, every row is saved in the local file
+	   first and a background thread append the rows not copied yet to the key when it is
+	   mounted. The offset of the last row copied is saved next to the local file
+	   (data.csv.sync) with the id of the key so only the new rows are copied, in a single
+	   write, and a other key get all the rows. The closed
+	   segments of the data file are compressed by the same thread and copied once.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+import atexit
+import binascii
+import threading
+from cls.binlog import BinaryLog, HEADER
+from cls.segment import FOLDER
+
+
+#___SYNC_CONFIG___
+
+#size of the blocks copied from the local file (in bytes)
+BLOCK = 65536
+
+#number of records of the binary log copied and saved in the checkpoint at once
+BATCH = 1024
+
+#file at the root of the usb key with its id, written the first time the key is used
+KEY = ".datakey"
+
+
+class UsbSync(object):
+
+	def __init__(self, machine):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the thread is started at the first request
+		@Input arg : (Control) machine : give the paths, the state of the key and the error log
+		@Return : n/a
+		"""
+
+		self.machine = machine
+		self.wake = threading.Event()
+		self.stopping = False
+		self.thread = None
+		#a single copy at a time (the thread or sync() called by the program)
+		self.lock = threading.Lock()
+		#the id given to a key by this program, the checkpoints without id are kept for it
+		self.made = None
+
+	def request(self):
+		"""
+		@Name : request()
+		@Brief : ask the thread to copy the new rows, never block
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.thread is None:
+			self.thread = threading.Thread(target=self.run, name="usbsync")
+			self.thread.daemon = True
+			self.thread.start()
+
+			#the rows left are copied when the program stop
+			atexit.register(self.close)
+
+		self.wake.set()
+
+	def close(self):
+		"""
+		@Name : close()
+		@Brief : stop the thread once the last rows are copied
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if self.thread is None or not self.thread.is_alive():
+			return
+
+		self.stopping = True
+		self.wake.set()
+		self.thread.join(30.0)
+
+	def run(self):
+		"""
+		@Name : run()
+		@Brief : main loop of the thread, copy the new rows every time it is asked
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		while True:
+			self.wake.wait()
+			self.wake.clear()
+
+			self.sync()
+
+			if self.stopping:
+				break
+
+	def sync(self):
+		"""
+		@Name : sync()
+		@Brief : compress the closed segments (see segment.py) and copy the rows not copied
+				 yet of every local data file, if the key is mounted
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		segments = self.machine.segments
+		local = self.machine.config_file.get("PATH", "local")
+
+		#the segments are compressed even without the key, a segment is complete once in
+		#the folder so the writes don't wait for the compression
+		if segments is not None:
+			try:
+				segments.compress()
+			except (IOError, OSError) as e:
+				self.machine.log(str(e), None, segments.folder, getattr(e, "errno", None))
+
+		usb = self.machine.is_usb()
+
+		if usb is None:
+			return
+
+		with self.lock:
+			try:
+				if segments is not None:
+					segments.copy(os.path.join(os.path.dirname(usb), FOLDER))
+
+				"""
+				The data file was cut, the rows of the old one are in the
+				segments copied on the key so the usb data file start again
+				with the new file. The old usb file is kept in the segments
+				folder of the key, it can have rows only on the key.
+				"""
+				if os.path.exists(local + ".rotated") and (segments is None or len(segments.pending()) == 0):
+					self.retire(local, usb)
+					os.remove(local + ".rotated")
+
+				if not os.path.exists(local + ".rotated"):
+					self.copyText(local, usb)
+
+				local = os.path.splitext(local)[0] + ".bin"
+				if os.path.exists(local):
+					self.copyBinary(local, os.path.splitext(usb)[0] + ".bin")
+			except (IOError, OSError) as e:
+				#the key was pulled out during the copy, the next copy start again from the checkpoint
+				self.machine.log(str(e), None, usb, getattr(e, "errno", None))
+				self.machine.mounts.invalidate()
+			except ValueError as e:
+				#a usb binary log that is not a log, it is not written over
+				self.machine.log(str(e), None, usb)
+
+	def retire(self, local, usb):
+		"""
+		@Name : retire()
+		@Brief : move the usb data file in the segments folder of the key after the local
+				 file was cut, the checkpoint start again with the new local file
+		@Input arg : (string) local : the local data file
+					 (string) usb : the usb data file
+		@Return : n/a
+		"""
+
+		if os.path.exists(usb):
+			folder = os.path.join(os.path.dirname(usb), FOLDER)
+			if not os.path.isdir(folder):
+				os.makedirs(folder)
+
+			#"data-key-20261018-071200.csv", not a name of the manifest
+			base, extension = os.path.splitext(os.path.basename(usb))
+			name = base + "-key-" + time.strftime("%Y%m%d-%H%M%S")
+			target = os.path.join(folder, name + extension)
+
+			count = 1
+			while os.path.exists(target):
+				target = os.path.join(folder, name + "-" + str(count) + extension)
+				count += 1
+
+			os.rename(usb, target)
+
+		self.save(local, 0, 0, self.identity(usb))
+
+	def copyText(self, local, usb):
+		"""
+		@Name : copyText()
+		@Brief : append the end of the local data file not copied yet to the usb data file
+		@Input arg : (string) local : the local data file
+					 (string) usb : the usb data file
+		@Return : n/a
+		"""
+
+		if not os.path.exists(local):
+			return
+
+		offset, size, key = self.checkpoint(local, usb)
+		end = os.path.getsize(local)
+
+		if offset >= end:
+			return
+
+		#the folder of a other bus on the key (see station.py)
+		if not os.path.isdir(os.path.dirname(usb)):
+			os.makedirs(os.path.dirname(usb))
+
+		with open(local, "rb") as source:
+			source.seek(offset)
+
+			#the usb file already have the header
+			if offset == 0 and size != 0:
+				header = source.readline()
+				if not header.startswith(b"TIME"):
+					source.seek(0)
+				offset = source.tell()
+
+			with open(usb, "ab") as target:
+				while offset < end:
+					block = source.read(min(BLOCK, end - offset))
+					if len(block) == 0:
+						break
+					target.write(block)
+					offset += len(block)
+
+				target.flush()
+				os.fsync(target.fileno())
+				size = os.fstat(target.fileno()).st_size
+
+		self.save(local, offset, size, key)
+
+	def copyBinary(self, local, usb):
+		"""
+		@Name : copyBinary()
+		@Brief : append the records of the local binary log not copied yet to the usb one,
+				 the offset is a number of records. The records are copied by batches with a
+				 checkpoint after each, so the memory used stay the same after a long time
+				 without the key.
+		@Input arg : (string) local : the local binary log
+					 (string) usb : the usb binary log
+		@Return : n/a
+		"""
+
+		source = BinaryLog(local, True)
+
+		try:
+			offset, size, key = self.checkpoint(local, usb, source.count)
+
+			if offset >= source.count:
+				return
+
+			target = BinaryLog(usb)
+			try:
+				batch = []
+				for record in source.records(offset):
+					batch.append(record)
+					if len(batch) == BATCH:
+						target.append(batch, True)
+						offset += len(batch)
+						self.save(local, offset, target.count, key)
+						batch = []
+
+				if len(batch) != 0:
+					target.append(batch, True)
+					offset += len(batch)
+					self.save(local, offset, target.count, key)
+			finally:
+				target.close()
+		finally:
+			source.close()
+
+	def checkpoint(self, local, usb, count=None):
+		"""
+		@Name : checkpoint()
+		@Brief : read the offset of the last row copied, saved with the size of the usb file
+				 after the copy and the id of the key. A usb file missing or a other key is
+				 copied from the start, a usb file bigger than saved on the same key was cut
+				 by a power loss after the copy and the checkpoint is moved by the bytes
+				 already copied.
+		@Input arg : (string) local : the local data file
+					 (string) usb : the usb data file
+					 (int) count : the number of records, for a binary log
+		@Return : (offset, size, key) the offset in the local file, the size of the usb file
+				  and the id of the key
+		"""
+
+		offset = 0
+		size = None
+		saved = None
+
+		try:
+			with open(local + ".sync", "r") as syncFile:
+				fields = syncFile.read().strip().split(";")
+				offset, size = int(fields[0]), int(fields[1])
+				saved = fields[2] if len(fields) > 2 else None
+		except (IOError, OSError, ValueError, IndexError):
+			pass
+
+		key = self.identity(usb)
+
+		if not os.path.exists(usb):
+			return 0, 0, key
+
+		if count is None:
+			actual = os.path.getsize(usb)
+			end = os.path.getsize(local)
+		elif os.path.getsize(usb) < HEADER.size:
+			#a usb log cut before its header, made again by the copy
+			actual = 0
+			end = count
+		else:
+			log = BinaryLog(usb, True)
+			actual = log.count
+			log.close()
+			end = count
+
+		"""
+		A other key (or the same key formatted), all the rows are copied after
+		the ones of the key. A checkpoint without id was saved before the keys
+		had one, it is only used if the key had no id either.
+		"""
+		if key != saved and not (key == self.made and saved is None):
+			offset = 0
+		else:
+			#no copy done yet, the rows of the usb file were not copied from the local file
+			if size is None:
+				size = actual
+
+			#the rows copied but not saved in the checkpoint
+			if actual > size:
+				offset = min(offset + actual - size, end)
+
+		#the checkpoint is tied to the key at once, even if there is nothing to copy
+		if key != saved:
+			self.save(local, offset, actual, key)
+
+		return offset, actual, key
+
+	def identity(self, usb):
+		"""
+		@Name : identity()
+		@Brief : the id of the usb key, a random number saved in a file at the root of the
+				 key the first time it is used
+		@Input arg : (string) usb : the usb data file
+		@Return : (string) the id
+		"""
+
+		path = os.path.join(self.machine.mounts.resolve(usb), KEY)
+
+		try:
+			with open(path, "r") as keyFile:
+				key = keyFile.read().strip()
+			if key != "":
+				return key
+		except (IOError, OSError):
+			pass
+
+		key = binascii.hexlify(os.urandom(8)).decode("ascii")
+		temp = path + ".tmp"
+
+		with open(temp, "w") as keyFile:
+			keyFile.write(key + "\n")
+			keyFile.flush()
+			os.fsync(keyFile.fileno())
+
+		os.replace(temp, path)
+
+		self.made = key
+
+		return key
+
+	def save(self, local, offset, size, key):
+		"""
+		@Name : save()
+		@Brief : save the checkpoint, the old one is replaced in a single step
+		@Input arg : (string) local : the local data file
+					 (int) offset : the offset of the last row copied
+					 (int) size : the size of the usb file after the copy
+					 (string) key : the id of the usb key
+		@Return : n/a
+		"""
+
+		temp = local + ".sync.tmp"
+
+		with open(temp, "w") as syncFile:
+			syncFile.write(str(offset) + ";" + str(size) + ";" + key + "\n")
+			syncFile.flush()
+			os.fsync(syncFile.fileno())
+
+		os.replace(temp, local + ".sync")
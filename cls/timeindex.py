@@ -0,0 +1,362 @@
+"""@package docstring
+File name : timeindex.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Time index of the data files, a sidecar file (data.csv.idx) give the byte offset of
+	   the first row of every hour, it is updated when the rows are appended. A query seek
+	   directly to the first row of the time window, the time of the query stay the same
+	   for a month or five years of data. The closed segments (see segment.py) are chosen
+	   by their time span in the manifest and read before the data file. The binary logs
+	   don't need a index, their fixed size records are searched directly.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+import gzip
+from cls.binlog import BinaryLog, STATUS_HEALTH, DIGITS
+from cls.segment import FOLDER, MANIFEST
+
+
+#___INDEX_FORMAT___
+
+#a entry is added for the first row of every bucket (in seconds)
+BUCKET = 3600
+
+#fixed size entry "time;offset\n", so the index can be searched without reading it all
+ENTRY = "%012d;%012d\n"
+ENTRY_SIZE = 26
+
+
+class TimeIndex(object):
+
+	def __init__(self, path):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor
+		@Input arg : (string) path : the path of the data file, the index is path + ".idx"
+		@Return : n/a
+		"""
+
+		self.path = path + ".idx"
+		#bucket of the last entry, read from the index when needed
+		self.last = None
+
+	def add(self, epoch, offset):
+		"""
+		@Name : add()
+		@Brief : give the time and offset of a row appended to the data file, a entry is only
+				 saved for the first row of a new bucket, a row older than the last entry
+				 (clock set back) is not indexed
+		@Input arg : (float) epoch : the time of the row in seconds since 1970
+					 (int) offset : the byte offset of the row in the data file
+		@Return : n/a
+		"""
+
+		self.addMany([(epoch, offset)])
+
+	def addMany(self, rows):
+		"""
+		@Name : addMany()
+		@Brief : same as add() for many rows, the entries are saved with a single append
+		@Input arg : (list) rows : the (time, offset) of the rows, in the order of the data file
+		@Return : n/a
+		"""
+
+		indexFile = None
+
+		#the last entry is read once, with the same open as the append
+		if self.last is None:
+			indexFile = open(self.path, "a+")
+			entry = self.entry(os.fstat(indexFile.fileno()).st_size // ENTRY_SIZE - 1, indexFile)
+			self.last = -1 if entry is None else entry[0] // BUCKET
+
+		lines = []
+
+		for epoch, offset in rows:
+			bucket = int(epoch) // BUCKET
+			if bucket > self.last:
+				lines.append(ENTRY % (int(epoch), offset))
+				self.last = bucket
+
+		if len(lines) != 0 and indexFile is None:
+			indexFile = open(self.path, "a")
+
+		if indexFile is not None:
+			if len(lines) != 0:
+				indexFile.write("".join(lines))
+			indexFile.close()
+
+	def count(self):
+		"""
+		@Name : count()
+		@Brief : the number of entries in the index
+		@Input arg : n/a
+		@Return : the number of entries
+		"""
+
+		if not os.path.exists(self.path):
+			return 0
+
+		return os.path.getsize(self.path) // ENTRY_SIZE
+
+	def entry(self, index, indexFile=None):
+		"""
+		@Name : entry()
+		@Brief : read a entry of the index
+		@Input arg : (int) index : the number of the entry
+					 (file) indexFile : the index already open, if any
+		@Return : (time, offset), None if the entry don't exist
+		"""
+
+		if index < 0:
+			return None
+
+		if indexFile is None:
+			if not os.path.exists(self.path):
+				return None
+			with open(self.path, "r") as indexFile:
+				return self.entry(index, indexFile)
+
+		indexFile.seek(index * ENTRY_SIZE)
+		line = indexFile.read(ENTRY_SIZE)
+
+		if len(line) != ENTRY_SIZE:
+			return None
+
+		fields = line.strip().split(";")
+		return (int(fields[0]), int(fields[1]))
+
+	def seek(self, epoch):
+		"""
+		@Name : seek()
+		@Brief : find the offset of the last indexed row before a time, by a binary search
+		@Input arg : (float) epoch : the time in seconds since 1970
+		@Return : the byte offset where the rows of this time start, 0 if not indexed
+		"""
+
+		count = self.count()
+
+		if count == 0:
+			return 0
+
+		with open(self.path, "r") as indexFile:
+			low = 0
+			high = count
+
+			#first entry after the time
+			while low < high:
+				middle = (low + high) // 2
+				if self.entry(middle, indexFile)[0] <= epoch:
+					low = middle + 1
+				else:
+					high = middle
+
+			if low == 0:
+				return 0
+
+			return self.entry(low - 1, indexFile)[1]
+
+	def rebuild(self):
+		"""
+		@Name : rebuild()
+		@Brief : make the index again from all the data file (ex: a old data.csv)
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		if os.path.exists(self.path):
+			os.remove(self.path)
+
+		self.last = -1
+		data = self.path[:-len(".idx")]
+		rows = []
+
+		with open(data, "rb") as dataFile:
+			offset = 0
+			for line in dataFile:
+				epoch = row_time(line.decode("ascii", "replace"))
+				if epoch is not None:
+					rows.append((epoch, offset))
+				offset += len(line)
+
+				if len(rows) >= 1024:
+					self.addMany(rows)
+					rows = []
+
+		self.addMany(rows)
+
+
+def row_time(line):
+	"""
+	@Name : row_time()
+	@Brief : read the time of a data.csv row ("HH:MM;DD/MM/YYYY;..." or "HH:MM:SS;DD/MM/YYYY;...")
+	@Input arg : (string) line : the row
+	@Return : the time in seconds since 1970, None if the row has no valid time
+	"""
+
+	fields = line.strip().split(";")
+
+	if len(fields) < 2:
+		return None
+
+	clock = fields[0].split(":")
+	date = fields[1].split("/")
+
+	try:
+		if len(clock) < 2 or len(date) != 3:
+			return None
+		second = int(clock[2]) if len(clock) > 2 else 0
+		return time.mktime((int(date[2]), int(date[1]), int(date[0]), int(clock[0]), int(clock[1]), second, 0, 0, -1))
+	except (ValueError, OverflowError):
+		return None
+
+
+def parse_time(text):
+	"""
+	@Name : parse_time()
+	@Brief : read a time given by the user, "DD/MM/YYYY" or "DD/MM/YYYY-HH:MM"
+	@Input arg : (string) text : the time
+	@Return : the time in seconds since 1970
+	"""
+
+	for form in ["%d/%m/%Y-%H:%M", "%d/%m/%Y"]:
+		try:
+			return time.mktime(time.strptime(text, form))
+		except ValueError:
+			pass
+
+	raise ValueError("Wrong time : " + text + ", use DD/MM/YYYY or DD/MM/YYYY-HH:MM")
+
+
+def query(path, start, end):
+	"""
+	@Name : query()
+	@Brief : give the rows of a data file between two times, only the rows of the window are
+			 read, for a data.csv the rows of the segments of the window come first and
+			 the index is made if it don't exist
+	@Input arg : (string) path : the data file (data.csv or data.bin)
+				 (float) start : the first time, in seconds since 1970
+				 (float) end : the time after the last row
+	@Return : a generator of (time, [readings as string])
+	"""
+
+	if path.endswith(".bin"):
+		log = BinaryLog(path, True)
+		try:
+			for stamp, station, readings, status in log.records(log.find(start)):
+				if stamp >= end:
+					break
+				if stamp >= start:
+					#the decimals of data.csv, like the export of the log
+					fields = ["" if value != value else ("%." + str(DIGITS[i]) + "f") % value for i, value in enumerate(readings)]
+					yield (stamp, fields + [str(status >> STATUS_HEALTH)])
+		finally:
+			log.close()
+		return
+
+	#the older rows, in the closed segments
+	for segment in segments(path, start, end):
+		with (gzip.open(segment, "rb") if segment.endswith(".gz") else open(segment, "rb")) as dataFile:
+			yield from rows(dataFile, start, end)
+
+	index = TimeIndex(path)
+	last = index.entry(index.count() - 1)
+
+	#no index yet, or a index of a older file (data.csv deleted or replaced)
+	if last is None or last[1] >= os.path.getsize(path):
+		index.rebuild()
+
+	with open(path, "rb") as dataFile:
+		dataFile.seek(index.seek(start))
+
+		yield from rows(dataFile, start, end)
+
+
+def rows(dataFile, start, end):
+	"""
+	@Name : rows()
+	@Brief : give the rows of a open data file between two times, from the current position
+	@Input arg : (file) dataFile : the data file, open in binary mode
+				 (float) start : the first time, in seconds since 1970
+				 (float) end : the time after the last row
+	@Return : a generator of (time, [readings as string])
+	"""
+
+	for line in dataFile:
+		line = line.decode("ascii", "replace")
+		epoch = row_time(line)
+
+		if epoch is None:
+			continue
+		if epoch >= end:
+			break
+		if epoch >= start:
+			yield (epoch, line.strip().rstrip(";").split(";")[2:])
+
+
+def segments(path, start, end):
+	"""
+	@Name : segments()
+	@Brief : the closed segments of a data file (see segment.py) that can have rows between
+			 two times, the compressed ones are chosen by the START and END of the manifest,
+			 the ones not compressed yet are always read. The old usb data files moved on
+			 the key ("data-key-...") hold the rows of the segments and are not read.
+	@Input arg : (string) path : the data file
+				 (float) start : the first time, in seconds since 1970
+				 (float) end : the time after the last row
+	@Return : (list) the paths of the segments, the oldest first
+	"""
+
+	folder = os.path.join(os.path.dirname(path), FOLDER)
+
+	if not os.path.isdir(folder):
+		return []
+
+	base, extension = os.path.splitext(os.path.basename(path))
+
+	#the time span of the compressed segments, {name : (start, end)}, None for a segment without rows
+	spans = {}
+
+	if os.path.exists(os.path.join(folder, MANIFEST)):
+		with open(os.path.join(folder, MANIFEST), "r") as manifestFile:
+			for line in manifestFile:
+				fields = [field.strip() for field in line.split(";")]
+				if len(fields) < 3 or fields[0] == "NAME":
+					continue
+				spans[fields[0]] = (span_time(fields[1]), span_time(fields[2]))
+
+	paths = []
+
+	#the names hold the time the segment was closed, so they are in the order of the rows
+	for name in sorted(os.listdir(folder)):
+		if not name.startswith(base + "-") or name.startswith(base + "-key-"):
+			continue
+
+		if name.endswith(extension + ".gz"):
+			span = spans.get(name)
+			if span is not None and (span[0] is None or span[1] is None or span[0] >= end or span[1] < start):
+				continue
+		elif not name.endswith(extension):
+			continue
+
+		paths.append(os.path.join(folder, name))
+
+	return paths
+
+
+def span_time(text):
+	"""
+	@Name : span_time()
+	@Brief : read a time of the manifest of the segments ("DD/MM/YYYY-HH:MM:SS")
+	@Input arg : (string) text : the time
+	@Return : the time in seconds since 1970, None if empty or not valid
+	"""
+
+	try:
+		return time.mktime(time.strptime(text, "%d/%m/%Y-%H:%M:%S"))
+	except ValueError:
+		return None
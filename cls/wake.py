@@ -0,0 +1,278 @@
+"""@package docstring
+File name : wake.py
+Auteur : Adam Martineau
+Date : 18/10/2026
+Bref : Planner of the next wake up of the Witty Pi, the measures are taken on a grid of
+	   the "interval" of the [WAKE] section (ex: every hour at the minute 0). The time
+	   from the power on to the measure (boot of the Raspberry Pi and of the EZO chips)
+	   is measured at every wake up, the Witty Pi is woken up that much before the next
+	   measure so the measure is on time without waiting. The times measured are saved
+	   in wake.json next to data.csv.
+Environnement : Rasbian Stretch 9.1
+Compilateur : Python 3.5.3
+Materiel : Rasberry Pi zero W
+Revision : V1.3
+"""
+
+import os
+import time
+import json
+import subprocess
+
+
+#___DEFAULT_CONFIG___
+
+#default values when missing from the [WAKE] section of config.ini
+INTERVAL = 3600.0		#time between two measures (in seconds)
+LEAD = 30.0				#time from the power on to the measure, before it is measured (in seconds)
+SHUTDOWN = 20.0			#time for the Raspberry Pi to shut down and the Witty Pi to cut the power (in seconds)
+UTILITIES = "/home/pi/wittyPi/utilities.sh"
+WAKE_FILE = "data/wake.txt"
+
+#number of wake up times kept, the longest one is used
+HISTORY = 8
+
+#file of the kernel giving the time since the power on
+UPTIME = "/proc/uptime"
+
+
+def openWake(config_file, emulate=False):
+	"""
+	@Name : openWake()
+	@Brief : make the object setting the wake up of the Raspberry Pi, the "backend" of the
+			 [WAKE] section choose between the Witty Pi and a file (for the tests)
+	@Input arg : (ConfigParser) config_file : the loaded config.ini
+				 (bool) emulate : if True the file is used whatever the config
+	@Return : the backend (see WittyPiWake), None if the wake up is not planned by the program
+	"""
+
+	backend = config_file.get("WAKE", "backend", fallback="none").lower()
+
+	if emulate or backend == "file":
+		return FileWake(config_file.get("WAKE", "path", fallback=WAKE_FILE))
+
+	if backend == "wittypi":
+		return WittyPiWake(config_file.get("WAKE", "utilities", fallback=UTILITIES))
+
+	return None
+
+
+class WittyPiWake(object):
+
+	def __init__(self, utilities):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor
+		@Input arg : (string) utilities : the path of utilities.sh of the Witty Pi
+		@Return : n/a
+		"""
+
+		self.utilities = utilities
+
+	def set(self, epoch):
+		"""
+		@Name : set()
+		@Brief : program the startup alarm of the Witty Pi, the RTC of the Witty Pi is in
+				 UTC (see system_to_rtc in utilities.sh)
+		@Input arg : (float) epoch : the time of the wake up
+		@Return : True if the alarm is set, else False
+		"""
+
+		when = time.gmtime(int(epoch))
+		command = ". " + self.utilities + "; set_startup_time %d %d %d %d" % (when.tm_mday, when.tm_hour, when.tm_min, when.tm_sec)
+
+		return subprocess.call(["bash", "-c", command]) == 0
+
+	def shutdown(self):
+		"""
+		@Name : shutdown()
+		@Brief : turn off the Raspberry Pi, the Witty Pi cut the power once it is halted
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		os.system("sudo shutdown now")
+
+
+class FileWake(object):
+
+	def __init__(self, path):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the wake up is written in a file instead of the Witty Pi
+		@Input arg : (string) path : the file
+		@Return : n/a
+		"""
+
+		self.path = path
+
+	def set(self, epoch):
+		"""
+		@Name : set()
+		@Brief : write the time of the wake up in the file ("epoch;DD/MM/YYYY-HH:MM:SS")
+		@Input arg : (float) epoch : the time of the wake up
+		@Return : True if the file is written, else False
+		"""
+
+		try:
+			with open(self.path, "w") as wakeFile:
+				wakeFile.write(str(int(epoch)) + ";" + time.strftime("%d/%m/%Y-%H:%M:%S", time.localtime(int(epoch))) + "\n")
+		except (IOError, OSError):
+			return False
+
+		return True
+
+	def shutdown(self):
+		"""
+		@Name : shutdown()
+		@Brief : the Raspberry Pi stay on for the tests
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		pass
+
+
+class WakePlanner(object):
+
+	def __init__(self, config_file, backend):
+		"""
+		@Name : __init__()
+		@Brief : the class constructor, the times measured before are read back
+		@Input arg : (ConfigParser) config_file : the loaded config.ini
+					 backend : set the wake up (see openWake())
+		@Return : n/a
+		"""
+
+		self.backend = backend
+		self.interval = config_file.getfloat("WAKE", "interval", fallback=INTERVAL)
+		self.default = config_file.getfloat("WAKE", "lead", fallback=LEAD)
+		self.margin = config_file.getfloat("WAKE", "shutdown", fallback=SHUTDOWN)
+		self.path = os.path.join(os.path.dirname(config_file.get("PATH", "local")), "wake.json")
+
+		#measure planned by the last run (epoch), times from the power on to the measure
+		#and times the Raspberry Pi was on, the last HISTORY of each (in seconds)
+		self.slot = None
+		self.leads = []
+		self.times = []
+
+		#True if this run was woken up by the planner
+		self.planned = False
+
+		try:
+			with open(self.path, "r") as wakeFile:
+				state = json.load(wakeFile)
+			self.slot = state.get("slot")
+			self.leads = [float(lead) for lead in state.get("lead", [])]
+			self.times = [float(on) for on in state.get("on", [])]
+		except (IOError, OSError, ValueError, TypeError, AttributeError):
+			pass
+
+	def lead(self):
+		"""
+		@Name : lead()
+		@Brief : the time from the power on to the measure used to plan the wake up, the
+				 longest of the last ones measured so the measure is never late
+		@Input arg : n/a
+		@Return : (float) the time (in seconds)
+		"""
+
+		if len(self.leads) == 0:
+			return self.default
+
+		return max(self.leads)
+
+	def align(self):
+		"""
+		@Name : align()
+		@Brief : called once the EZO chips are ready, save the time since the power on and
+				 wait for the measure planned if the wake up was early. A run started by hand
+				 (far from the measure planned) don't wait.
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		now = time.time()
+		up = uptime()
+
+		if self.slot is None or up is None or abs(self.slot - now) > self.interval / 2 or up > self.interval:
+			return
+
+		self.planned = True
+		self.leads = (self.leads + [up])[-HISTORY:]
+
+		if self.slot > now:
+			time.sleep(self.slot - now)
+
+	def plan(self):
+		"""
+		@Name : plan()
+		@Brief : called at the end of the run, set the wake up for the next measure of the
+				 grid that can be reached after the shut down
+		@Input arg : n/a
+		@Return : (float) the time of the wake up, None if it could not be set
+		"""
+
+		now = time.time()
+		up = uptime()
+
+		if self.planned and up is not None:
+			self.times = (self.times + [up])[-HISTORY:]
+
+		lead = self.lead()
+
+		#the first measure of the grid after the shut down and the boot
+		self.slot = (int((now + self.margin + lead) // self.interval) + 1) * self.interval
+		wake = self.slot - lead
+
+		self.save()
+
+		if not self.backend.set(wake):
+			return None
+
+		return wake
+
+	def ontime(self):
+		"""
+		@Name : ontime()
+		@Brief : the mean time the Raspberry Pi is on for a measure
+		@Input arg : n/a
+		@Return : (float) the time (in seconds), None if not measured yet
+		"""
+
+		if len(self.times) == 0:
+			return None
+
+		return sum(self.times) / len(self.times)
+
+	def save(self):
+		"""
+		@Name : save()
+		@Brief : save the measure planned and the times measured in wake.json
+		@Input arg : n/a
+		@Return : n/a
+		"""
+
+		temp = self.path + ".tmp"
+
+		try:
+			with open(temp, "w") as wakeFile:
+				json.dump({"slot" : self.slot, "lead" : self.leads, "on" : self.times}, wakeFile)
+			os.replace(temp, self.path)
+		except (IOError, OSError):
+			pass
+
+
+def uptime():
+	"""
+	@Name : uptime()
+	@Brief : the time since the power on of the Raspberry Pi
+	@Input arg : n/a
+	@Return : (float) the time (in seconds), None if not known
+	"""
+
+	try:
+		with open(UPTIME, "r") as uptimeFile:
+			return float(uptimeFile.read().split()[0])
+	except (IOError, OSError, ValueError, IndexError):
+		return None
@@ -14,16 +14,26 @@ Revision : V1.2
 
 #___IMPORTS___
 
-import smbus
 import time
 import os
 import sys
+import signal
+import threading
 import configparser
-from cls.control import Control
+from cls.station import openStations, configs
+from cls.record import RecordWriter
+from cls.metrics import Metrics
+from cls import binlog
+from cls import timeindex
+from cls.journal import Journal
+from cls.wake import WakePlanner, openWake
+from cls.aggregate import AggregateStore
+from cls.segment import FOLDER
 
 #___SOURCE_DIRECTORY___
 
-os.chdir("/home/pi/brazilproject")
+#the folder of this file, /home/pi/brazilproject on the Raspberry Pi
+os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 
 #___CONFIG_FILE_INITIALIZATION___
@@ -50,24 +60,115 @@ if not os.path.exists("cfg/config.ini"):
 			   "[PATH]\n" +
 			   "usb = /media/usb0/data.csv\n" +
 			   "local = data/data.csv\n" +
-			   "error = err/errorlog.txt\n")
+			   "error = err/errorlog.txt\n" +
+			   "\n" +
+			   "[WARMUP]\n" +
+			   "temp_min = 3\n" +
+			   "temp_max = 16\n" +
+			   "temp_tolerance = 0.05\n" +
+			   "con_min = 3\n" +
+			   "con_max = 16\n" +
+			   "con_tolerance = 1.0\n" +
+			   "ph_min = 3\n" +
+			   "ph_max = 16\n" +
+			   "ph_tolerance = 0.02\n" +
+			   "do_min = 3\n" +
+			   "do_max = 16\n" +
+			   "do_tolerance = 0.05\n" +
+			   "\n" +
+			   "[RECORD]\n" +
+			   "batch = 1\n" +
+			   "fsync = yes\n" +
+			   "journal = yes\n" +
+			   "\n" +
+			   "[ERROR]\n" +
+			   "max_size = 262144\n" +
+			   "backups = 3\n" +
+			   "burst = 60\n" +
+			   "rate = 8192\n" +
+			   "\n" +
+			   "[METRICS]\n" +
+			   "enable = no\n" +
+			   "counts = yes\n" +
+			   "\n" +
+			   "[STORAGE]\n" +
+			   "backend = csv\n" +
+			   "station = 1\n" +
+			   "\n" +
+			   "[DAEMON]\n" +
+			   "interval = 240\n" +
+			   "batch = 1\n" +
+			   "\n" +
+			   "[STREAM]\n" +
+			   "period = 1.0\n" +
+			   "batch = 60\n" +
+			   "compensate = 60\n" +
+			   "\n" +
+			   "[COMPENSATION]\n" +
+			   "temperature = 0.1\n" +
+			   "salinity = 100.0\n" +
+			   "\n" +
+			   "[SAMPLING]\n" +
+			   "mode = single\n" +
+			   "\n" +
+			   "[SUMMARY]\n" +
+			   "enable = yes\n" +
+			   "\n" +
+			   "[SEGMENT]\n" +
+			   "enable = yes\n" +
+			   "period = day\n" +
+			   "max_size = 4194304\n" +
+			   "\n" +
+			   "[BOOT]\n" +
+			   "timeout = 10.0\n" +
+			   "\n" +
+			   "[WAKE]\n" +
+			   "backend = none\n" +
+			   "interval = 3600\n" +
+			   "lead = 30\n" +
+			   "shutdown = 20\n" +
+			   "utilities = /home/pi/wittyPi/utilities.sh\n" +
+			   "path = data/wake.txt\n" +
+			   "\n" +
+			   "[HEALTH]\n" +
+			   "retries = 3\n" +
+			   "backoff = 0.01\n" +
+			   "threshold = 3\n" +
+			   "cooldown = 10\n" +
+			   "\n" +
+			   "[BUS]\n" +
+			   "driver = smbus\n" +
+			   "number = 1\n" +
+			   "\n" +
+			   "[EMULATOR]\n" +
+			   "fault = 0.0\n")
 			   
 	#closing file
 	file.close()
 
+#a change of config.ini cut by a power loss is done again before reading it
+Journal("cfg/config.ini.wal").recover()
+
 #we read config.ini
 config_file.read("cfg/config.ini")
 
 
 #___GLOBAL_VAR___
 
-#making of a object to communicate on the I2C bus
-bus = smbus.SMBus(1)
+"""
+The buses and the objects using them are made by setup(), only
+by the modes that need them (see main())
+"""
+#one station per I2C bus, the first one from [BUS] and one per [BUS:name] section (see cls/station.py)
+stations = []
+#the I2C bus of the first station, or the software emulation with the argument "--emulate" (see cls/emulator.py)
+bus = None
 #classe with all the sub fonction inside
-machine = Control(config_file, bus)	
-
-
-#___FILE_INITIALIZATION___
+machine = None
+#timing of the stages of the cycle, saved in metrics.csv when enabled in config.ini
+metrics = None
+#acquisition engine of the first station, work on all the EZO chips at the same time
+engine = None
 
 """
 Reading of the I2C address 
@@ -82,49 +183,94 @@ addressDO = config_file.getint("ADDRESS", "DO")
 address = [addressTEMP, addressCON, addressPH, addressDO]
 
 
-"""
-Initialiation 
-of errorlog.txt
-"""
-#if no error log file is detected we create your own
-if not os.path.exists(config_file.get("PATH", "ERROR")):
-	errorfile_ = open(config_file.get("PATH", "ERROR"), "a")
-	errorfile_.close()
+#___INITIALIZATION___
+def setup(data=True):
+	"""
+	@Name : setup()
+	@Brief : open the I2C buses and make the objects using them, and the data files for the
+			 modes taking measures
+	@Input arg : (bool) data : if True the data files are made (see files())
+	@Return : n/a
+	"""
+	
+	global stations, bus, machine, metrics, engine
+	
+	metrics = Metrics(config_file)
+	stations = openStations(config_file, "--emulate" in sys.argv, metrics)
+	
+	#the config menu and the manual commands only use the first bus
+	bus = stations[0].bus
+	machine = stations[0].machine
+	engine = stations[0].engine
+	
+	if data:
+		files()
 
-"""
-Initialiation 
-of local data file 
-"""
-#if no data file is detected we create a new one
-if not os.path.exists(config_file.get("PATH", "LOCAL")):
-	datafile_ = open(config_file.get("PATH", "LOCAL"), "a")
-	datafile_.write("TIME; DATE; TEMP; CON; PH; DO; \n")
-	datafile_.close()
+def files():
+	"""
+	@Name : files()
+	@Brief : make the error log and the local data file of every station if they are missing
+	@Input arg : n/a
+	@Return : n/a
+	"""
 	
-"""
-Initialiation 
-of a usb data file 
-"""
-#if no data file is detected we create a new one
-if machine.is_usb():
-	if not os.path.exists(config_file.get("PATH", "USB")):
-		datafile_ = open(config_file.get("PATH", "USB"), "a")
-		datafile_.write("TIME; DATE; TEMP; CON; PH; DO; \n")
-		datafile_.close()
-else:
-	errorFile = open(config_file.get("PATH", "error"), "a")
-	errorFile.write("NO USB STRORAGE DETECTED" + " : " + time.strftime("%H:%M;%d/%m/%Y") + "\n")
-	errorFile.close()
+	"""
+	Initialiation 
+	of errorlog.txt
+	"""
+	#if no error log file is detected we create your own
+	if not os.path.exists(config_file.get("PATH", "ERROR")):
+		errorfile_ = open(config_file.get("PATH", "ERROR"), "a")
+		errorfile_.close()
+	
+	"""
+	Initialiation 
+	of local data file 
+	"""
+	#if no data file is detected we create a new one, the other buses have their own folder
+	for station in stations:
+		path = station.config_file.get("PATH", "LOCAL")
+		
+		if os.path.dirname(path) != "" and not os.path.isdir(os.path.dirname(path)):
+			os.makedirs(os.path.dirname(path))
+		
+		header = station.engine.sensors.header()
+		
+		if not os.path.exists(path):
+			datafile_ = open(path, "a")
+			datafile_.write(header)
+			datafile_.close()
+			continue
+		
+		#the columns changed (health, other probes, stats), the old rows keep their header
+		#in the segments folder and a new file is started
+		with open(path, "r") as datafile_:
+			first = datafile_.readline()
+		
+		if first.startswith("TIME") and first.replace(" ", "").strip() != header.replace(" ", "").strip():
+			station.machine.rotateData(path, header)
+			station.machine.log("DATA FILE : NEW COLUMNS, OLD FILE MOVED IN " + FOLDER)
+	
+	"""
+	The usb data file is a copy of the local one,
+	made by the background sync (see cls/sync.py)
+	"""
+	if not machine.is_usb():
+		machine.log("NO USB STRORAGE DETECTED")
 
 	
 #___MAIN___
-def main(arg):
+def main(arg, params=None):
 	"""
 	@Name : main()
 	@Brief : point of the start for the program
-	@Input arg : n/a
+	@Input arg : (string) arg : the mode of the program
+				 (list) params : the arguments after the mode, if any
 	@Return : n/a
 	"""
+	
+	if params is None:
+		params = []
 
 	#--- MAIN SWITCH CASE ---
 	#if no argument is passed
@@ -133,17 +279,48 @@ def main(arg):
 		print("Auto : the standar programe, take measures and save them on a USB key")
 		print("Config : change the I2C address of the EZO chips or the path were measures are saved")
 		print("Test : takes 10 reading to be sur everything is working")
+		print("Daemon : stay running and take measures at the interval of config.ini, for powered stations")
+		print("Stream : read all the probes every second (see [STREAM] in config.ini) until stopped")
+		print("Export FILE.bin [FILE.csv] : write a binary log in the data.csv format")
+		print("Query FILE START END [PROBE] : print the rows between two times (DD/MM/YYYY or DD/MM/YYYY-HH:MM)")
+		print("Status [PROBE] : print the count, min, max and mean of the last hours and days")
+		print("Add --emulate after the argument to use emulated EZO chips instead of the I2C bus")
 
 	#if the arg "auto" is used to start the scrip, we take measures
 	elif arg.upper() == "AUTO":
+		setup()
 		auto()
 
 	#if the arg "config" is used to start the scrip, we lunch the user interface
 	elif arg.upper() == "CONFIG":
+		setup(False)
 		config()
 		
 	elif arg.upper() == "TEST":
+		setup()
 		test()
+	
+	#if the arg "daemon" is used, we take measures until we are stopped
+	elif arg.upper() == "DAEMON":
+		setup()
+		daemon()
+	
+	#if the arg "stream" is used, we read the probes as fast as the config allow until we are stopped
+	elif arg.upper() == "STREAM":
+		setup()
+		stream()
+	
+	#if the arg "export" is used, a binary log is written in the data.csv format
+	elif arg.upper() == "EXPORT":
+		export(params)
+	
+	#if the arg "query" is used, the rows of a time window are printed
+	elif arg.upper() == "QUERY":
+		query(params)
+	
+	#if the arg "status" is used, the summary of the last hour and day is printed
+	elif arg.upper() == "STATUS":
+		status(params)
 		
 	else :
 		print("Wrong argument")
@@ -154,71 +331,360 @@ def auto():
 	"""
 	@Name : auto()
 	@Brief : fonction called for the automatic part of the programe
-			 take mesurs on all 4 probes and save the data 
+			 take mesurs on all 4 probes of every bus and save the data
 	@Input arg : n/a
 	@Return : n/a
 	"""
 	
-	#variables to save data for later compensation
-	Temperature = 0.00
-	WaterSal = 0.00
+	metrics.begin()
+	
+	timeout = config_file.getfloat("BOOT", "timeout", fallback=10.0)
+	
+	def ready(station):
+		for adr in station.machine.ready(station.probes(), timeout):
+			station.machine.log("EZO NOT READY AFTER THE BOOT", adr)
+	
+	#we wait for the I2C buses and the EZO chips after the boot of the Raspberry Pi
+	mark = metrics.start()
+	parallel(ready)
+	metrics.stop("boot", None, mark)
+	
+	#the next wake up of the Witty Pi is planned by the program (see cls/wake.py)
+	backend = openWake(config_file, "--emulate" in sys.argv)
+	planner = None
 	
-	#we wait for the Raspberry Pi to boot
-	time.sleep(10)
+	if backend is not None:
+		planner = WakePlanner(config_file, backend)
+		#a early wake up wait for the time of the measure
+		planner.align()
 	
-	#adding a space between all readings
-	machine.writeData("\n")
+	def work(station):
+		#the timing of the first bus is begun with the boot, the other buses have their own
+		other = station.engine.metrics is not metrics
+		if other:
+			station.engine.metrics.begin()
+	
+		#the row is built in memory and saved in one write
+		record = RecordWriter(station.machine, station.config_file)
+	
+		measure(station, record)
+	
+		record.close()
+	
+		if other:
+			station.engine.metrics.flush()
+	
+	#all the buses are measured at the same time
+	parallel(work)
+	
+	metrics.flush()
+	
+	#the new rows are copied to the usb key before the Raspberry Pi is turned off
+	for station in stations:
+		station.machine.sync.close()
+	
+	if planner is None:
+		return
+	
+	wake = planner.plan()
+	
+	#without a wake up planned the station would never start again, we stay on
+	if wake is None:
+		machine.log("WAKE UP NOT SET, NO SHUTDOWN")
+		return
+	
+	#the next wake up and the mean time on per measure (to check the gain of the planner)
+	#are saved in metrics.csv, they are not errors
+	ontime = planner.ontime()
+	metrics.count("next_wake", None, int(wake))
+	if ontime is not None:
+		metrics.count("ontime", None, "%.1f" % ontime)
+	metrics.flush()
+	
+	#the last lines of the error log are written before the power is cut
+	machine.errors.close()
+	backend.shutdown()
+
+
+def parallel(function):
+	"""
+	@Name : parallel()
+	@Brief : call a function for every station at the same time, one thread per bus, the
+			 first station is done by the calling thread
+	@Input arg : (function) function : called with the station
+	@Return : n/a
+	"""
+	
+	threads = []
+	
+	for station in stations[1:]:
+		thread = threading.Thread(target=function, args=(station,), name="bus-" + station.name)
+		thread.start()
+		threads.append(thread)
+	
+	function(stations[0])
+	
+	for thread in threads:
+		thread.join()
+
+
+def measure(station, record):
+	"""
+	@Name : measure()
+	@Brief : take one reading on all the probes of a station and add the row to the record
+			 writer, used by all the modes
+	@Input arg : (Station) station : the bus measured
+				 (RecordWriter) record : where the row is saved
+	@Return : n/a
+	"""
 	
 	#we save the time and dita in our data file
-	machine.writeData(time.strftime("%H:%M;%d/%m/%Y;"))
+	record.stamp(time.localtime())
+	
+	"""
+	All the probes are waken up and read together, the
+	compensation of a probe is done by the engine once
+	the readings it need are available (see cls/sensors.py)
+	"""
+	readings = station.engine.cycle(station.probes())
+	
+	#we save the readings in the usb key, in the order of the "address" list
+	mark = station.engine.metrics.start()
 	
-	#we do the "for" loop for all the sensors in the "address" list
-	for i in range(0, 4):
-		adr = address[i]
+	#with the health of the probes (retries, failures, skipped probes, see cls/health.py)
+	#and the statistics of the readings in the "stats" sampling mode
+	for field in station.engine.sensors.row(readings, station.machine.health.mask(station.address), station.engine.stats):
+		record.add(field)
+	
+	record.commit()
+	
+	station.engine.metrics.stop("write", None, mark)
 
-		#waking up the EZO from sleep
-		machine.Sleep(False, adr)
-		
-		#we need to take 16 reading after the wake up to be sure the reading are accurate
-		for i in range(16):
-			machine.write(adr, "r", 0.9)
-		
-		"""
-		Temprature and salinity compensation
-		"""
-		if adr == config_file.getint("ADDRESS", "CON"):
-			machine.write(adr, "T," + str(Temperature), 0.3)
-		elif adr == config_file.getint("ADDRESS", "PH"):
-			machine.write(adr, "T," + str(Temperature), 0.3)
-		elif adr == config_file.getint("ADDRESS", "DO"):
-			machine.write(adr, "T," + str(Temperature), 0.3)
-			machine.write(adr, "S," + str(WaterSal), 0.3)
-		
-		"""
-		we send the char "R" to read once the 
-		sensor to take a reading
-		"""
-		machine.write(adr, "r", 0.9)
+def daemon():
+	"""
+	@Name : daemon()
+	@Brief : fonction called for the stations powered all the time, the program stay running
+			 with the bus and the data files open and take measures at the interval of the
+			 [DAEMON] section of config.ini, the interval don't drift with the cycle time.
+			 A SIGTERM or SIGINT stop the program once the current cycle is saved.
+	@Input arg : n/a
+	@Return : n/a
+	"""
+	
+	interval = config_file.getfloat("DAEMON", "interval", fallback=240.0)
+	
+	#set by the signals to stop the program
+	stop = stopper()
+	
+	start = time.time()
+	
+	def work(station):
+		#the data files stay open and the rows are batched
+		station.machine.resident = True
+		record = RecordWriter(station.machine, station.config_file, config_file.getint("DAEMON", "batch", fallback=1))
+	
+		cycle = 0
+	
+		try:
+			while not stop.is_set():
+				station.engine.metrics.begin()
+	
+				measure(station, record)
+	
+				station.engine.metrics.flush()
+	
+				"""
+				The next cycle start at a multiple of the interval from the
+				start, a cycle longer than the interval skip the missed ones
+				"""
+				cycle = max(cycle + 1, int((time.time() - start) / interval) + 1)
+				stop.wait(max(0.0, start + cycle * interval - time.time()))
+		finally:
+			record.close()
+			station.machine.closeData()
+	
+	#every bus keep its own cycle
+	parallel(work)
 
-		#we read back the answer from the EZO circuit
-		buffer = machine.read(adr)
+
+def stream():
+	"""
+	@Name : stream()
+	@Brief : fonction called for the high rate readings, the probes stay awake and are all
+			 read at the period of the [STREAM] section of config.ini, every row is saved with
+			 the time (HH:MM:SS) of the bus read. A SIGTERM or SIGINT stop the stream.
+	@Input arg : n/a
+	@Return : n/a
+	"""
+	
+	period = config_file.getfloat("STREAM", "period", fallback=1.0)
+	compensate = config_file.getint("STREAM", "compensate", fallback=60)
+	
+	#set by the signals to stop the program
+	stop = stopper()
+	
+	#the readings of the warm-up are saved in metrics.csv
+	metrics.begin()
+	
+	def work(station):
+		other = station.engine.metrics is not metrics
+		if other:
+			station.engine.metrics.begin()
 		
-		#the EZO circuit is put back to sleep
-		machine.Sleep(True, adr)
+		#the data files stay open and the rows are batched, a batch is all the memory used
+		station.machine.resident = True
+		record = RecordWriter(station.machine, station.config_file, config_file.getint("STREAM", "batch", fallback=60))
+	
+		try:
+			for stamp, values in rows(station, station.engine.stream(station.probes(), period, stop, compensate)):
+				record.stamp(time.localtime(stamp), True)
+				for value in values:
+					record.add(value)
+				record.commit()
+		finally:
+			record.close()
+			station.machine.closeData()
+			if other:
+				station.engine.metrics.flush()
+	
+	parallel(work)
+	
+	metrics.flush()
+
+def rows(station, samples):
+	"""
+	@Name : rows()
+	@Brief : convert the samples of the stream to rows, in the order of the "address" list
+	@Input arg : (Station) station : the bus of the samples
+				 (generator) samples : the samples of Acquisition.stream()
+	@Return : a generator of (time of the first bus read, fields of the row (see Registry.row()))
+	"""
+	
+	for sample in samples:
+		stamp = min(sample[adr][0] for adr in sample)
+		readings = dict((adr, sample[adr][1]) for adr in sample)
+		yield (stamp, station.engine.sensors.row(readings, station.machine.health.mask(station.address)))
+
+def stopper():
+	"""
+	@Name : stopper()
+	@Brief : catch SIGTERM and SIGINT to stop the modes running until stopped
+	@Input arg : n/a
+	@Return : (Event) set when a signal is received
+	"""
+	
+	stop = threading.Event()
+	
+	def handler(signum, frame):
+		stop.set()
+	
+	signal.signal(signal.SIGTERM, handler)
+	signal.signal(signal.SIGINT, handler)
+	
+	return stop
+
+
+def export(params):
+	"""
+	@Name : export()
+	@Brief : write a binary log (see cls/binlog.py) in the data.csv format
+	@Input arg : (list) params : the path of the binary log, and of the csv file (else the screen)
+	@Return : n/a
+	"""
+	
+	if len(params) == 0:
+		print("Use : export FILE.bin [FILE.csv]")
+		return
+	
+	if not os.path.isfile(params[0]):
+		print("Wrong file, " + params[0] + " is not a binary log")
+		return
+	
+	if len(params) > 1:
+		output = open(params[1], "w")
+	else:
+		output = sys.stdout
+	
+	try:
+		count = binlog.export(params[0], output)
+	except (ValueError, OSError) as e:
+		print(str(e))
+		#the csv file is not left empty
+		if output is not sys.stdout:
+			output.close()
+			os.remove(params[1])
+		return
+	
+	if output is not sys.stdout:
+		output.close()
+		print(str(count) + " rows exported")
+
+
+def query(params):
+	"""
+	@Name : query()
+	@Brief : print the rows of a data file (data.csv or data.bin) between two times, the
+			 file is searched with its time index and the rows of its closed segments of
+			 the window are printed first (see cls/timeindex.py)
+	@Input arg : (list) params : the path of the data file, the start and end times,
+				 and the probe to print (TEMP, CON, PH or DO), else all of them
+	@Return : n/a
+	"""
+	
+	if len(params) < 3:
+		print("Use : query FILE START END [PROBE], the times are DD/MM/YYYY or DD/MM/YYYY-HH:MM")
+		return
+	
+	probes = ["TEMP", "CON", "PH", "DO"]
+	
+	try:
+		start = timeindex.parse_time(params[1])
+		end = timeindex.parse_time(params[2])
+	except ValueError as e:
+		print(str(e))
+		return
+	
+	if len(params) > 3 and params[3].upper() not in probes:
+		print("Wrong probe, use TEMP, CON, PH or DO")
+		return
+	
+	if not os.path.isfile(params[0]):
+		print("Wrong file, " + params[0] + " is not a data file")
+		return
+	
+	#a single probe, else all the fields
+	column = probes.index(params[3].upper()) if len(params) > 3 else None
+	
+	try:
+		for epoch, fields in timeindex.query(params[0], start, end):
+			if column is not None:
+				fields = fields[column:column + 1]
+			print(time.strftime("%H:%M:%S;%d/%m/%Y;", time.localtime(epoch)) + ";".join(fields))
+	except (ValueError, OSError) as e:
+		print(str(e))
+
+
+def status(params):
+	"""
+	@Name : status()
+	@Brief : print the summary of the last finished hour and day and of the ones not finished
+			 for every station, read from summary.csv and summary.json (see cls/aggregate.py),
+			 the data files are not read
+	@Input arg : (list) params : the probe to print, else all of them
+	@Return : n/a
+	"""
+	
+	probe = params[0].upper() if len(params) > 0 else None
+	
+	for name, station in configs(config_file):
+		if name is not None:
+			print("BUS " + name)
 		
-		#we save the reading in the usb key
-		machine.writeData(str(buffer) + ";")
+		summary = AggregateStore(os.path.dirname(station.get("PATH", "local")))
 		
-		"""
-		Saving temprature and salinity
-		for compensation later 
-		"""
-		if adr == config_file.getint("ADDRESS", "TEMP"):
-			_Temperature = buffer
-		elif adr == config_file.getint("ADDRESS", "CON"):
-			_DivolvedOxy = buffer
-	
-	#os.system("sudo shutdown now")
+		for line in summary.status():
+			if probe is None or line.split(";")[2] == probe:
+				print(line, end="")
 
 
 def config():
@@ -339,25 +805,15 @@ def manual():
 			if send.upper() == "QUIT":
 				break
 			
-			machine.write(controlAdr, send, 1.3)
-			
-			#read the answer from the sensor
-			inflow = []
+			#a sleeping circuit don't answer, polling it would wake it up
+			if send.upper() == "SLEEP":
+				machine.Sleep(True, controlAdr)
+				continue
 			
-			if send != "sleep":
-				try:
-					inflow = bus.read_i2c_block_data(controlAdr, 0)
-				except Exception as e:
-					print("Can't read at that address")
-
-			#we convert a list of int to a string
-			output = ""
+			machine.write(controlAdr, send, 1.3)
 			
-			if len(inflow) != 0:
-				inflow[0] = 0
-				for i in inflow:
-					i &= 0x7F
-					output = output + chr(i)
+			#read the answer from the sensor, already read while waiting for the command
+			output = machine.read(controlAdr)
 			
 			print("output : " + output)
 			
@@ -372,60 +828,22 @@ def test():
 	@Input arg : n/a
 	@Return : n/a
 	"""
+	
+	def work(station):
+		#the rows are built in memory and saved in one write
+		record = RecordWriter(station.machine, station.config_file)
+	
+		for x in range(0, 20):
+			station.engine.metrics.begin()
+	
+			measure(station, record)
+	
+			station.engine.metrics.flush()
+	
+		record.close()
+	
+	parallel(work)
 
-	for x in range(0, 20):
-		#adding a space between all readings
-		machine.writeData("\n")
-		
-		#we save the time and dita in our data file
-		machine.writeData(time.strftime("%H:%M;%d/%m/%Y;"))
-		
-		#we do the "for" loop for all the sensors in the "address" list
-		for i in range(0, 4):
-			adr = address[i]
-			
-			#waking up the EZO from sleep
-			machine.Sleep(False, adr)
-			
-			#we need to take 16 reading after the wake up to be sure the reading are accurate
-			for i in range(16):
-				machine.write(adr, "r", 0.9)
-			
-			"""
-			Temprature and salinity compensation
-			"""
-			if adr == config_file.getint("ADDRESS", "CON"):
-				machine.write(adr, "T," + _Temperature, 0.3)
-			elif adr == config_file.getint("ADDRESS", "PH"):
-				machine.write(adr, "T," + _Temperature, 0.3)
-			elif adr == config_file.getint("ADDRESS", "DO"):
-				machine.write(adr, "T," + _Temperature, 0.3)
-				machine.write(adr, "S," + _DivolvedOxy, 0.3)
-			
-			"""
-			we send the char "R" to read once the 
-			sensor to take a reading
-			"""
-			machine.write(adr, "r", 0.9)
-
-			#we read back the answer from the EZO circuit
-			buffer = machine.read(adr)
-			
-			#the EZO circuit is put back to sleep
-			machine.Sleep(True, adr)
-			
-			#we save the reading in the usb key
-			machine.writeData(str(buffer) + ";")
-			
-			"""
-			Saving temprature and salinity
-			for compensation later 
-			"""
-			if adr == config_file.getint("ADDRESS", "TEMP"):
-				_Temperature = buffer
-			elif adr == config_file.getint("ADDRESS", "CON"):
-				_DivolvedOxy = buffer
-		
 def printMenu():
 	"""
 	@Name : printMenu()
@@ -469,7 +887,10 @@ def printMenu():
 #Entry point of the program, calls out main()
 if __name__ == '__main__':
 
-	if len(sys.argv) > 1:
-		main(str(sys.argv[1]))
+	#the options (ex: --emulate) are not the argument of the program
+	args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
+	if len(args) > 0:
+		main(str(args[0]), args[1:])
 	else:
 		main("")